@@ -4,13 +4,14 @@ Script para migrar screencaps de TrekCore a AWS S3
 ESTE SCRIPT ES UNA PLANTILLA - Requiere configurar credenciales AWS
 """
 
-import json
-import requests
 import boto3
 import os
 import time
 from botocore.exceptions import NoCredentialsError
 
+from trekcore_http import http_get
+from trekcore_journal import ScreencapsJournal, iter_screencaps
+
 # Configuración AWS
 AWS_ACCESS_KEY = 'TU_ACCESS_KEY'
 AWS_SECRET_KEY = 'TU_SECRET_KEY'
@@ -19,14 +20,7 @@ AWS_REGION = 'us-east-1'
 
 # Archivos
 SCREENCAPS_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.json'
-
-def load_json(filepath):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def save_json(filepath, data):
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+SCREENCAPS_JOURNAL_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.journal.jsonl'
 
 def migrate_images():
     # Inicializar cliente S3
@@ -35,12 +29,17 @@ def migrate_images():
                       aws_secret_access_key=AWS_SECRET_KEY,
                       region_name=AWS_REGION)
 
-    data = load_json(SCREENCAPS_JSON_PATH)
+    # Los episodios migrados se añaden al diario y se fusionan con __screencaps.json al
+    # final, que se lee en streaming (no se carga ni se reescribe entero por episodio)
+    journal = ScreencapsJournal(SCREENCAPS_JOURNAL_PATH, SCREENCAPS_JSON_PATH, log=print)
+    if journal.pending():
+        # Migración anterior interrumpida: sus episodios no se vuelven a subir
+        journal.compact()
     total_migrated = 0
     
-    print(f"🚀 Iniciando migración de {data['total_episodes']} episodios...")
+    print(f"🚀 Iniciando migración de {SCREENCAPS_JSON_PATH}...")
 
-    for episode in data['screencaps']:
+    for episode in iter_screencaps(SCREENCAPS_JSON_PATH):
         new_urls = []
         changed = False
         
@@ -57,7 +56,7 @@ def migrate_images():
                     
                     # Descargar imagen
                     print(f"  ⬇️ Descargando {filename}...")
-                    response = requests.get(url, stream=True)
+                    response = http_get(url, stream=True)
                     
                     if response.status_code == 200:
                         # Subir a S3
@@ -82,9 +81,12 @@ def migrate_images():
             episode['screencaps'] = new_urls
             episode['source'] = 'aws_s3'
             
-            # Guardar progreso parcial cada 5 episodios
-            save_json(SCREENCAPS_JSON_PATH, data)
+            # Guardar progreso parcial (una línea en el diario)
+            journal.append([episode])
 
+    if journal.pending():
+        total, _ = journal.compact()
+        print(f"💾 {SCREENCAPS_JSON_PATH} actualizado: {total} episodios")
     print("=" * 50)
     print(f"✅ Migración completada. {total_migrated} imágenes movidas a S3.")
 
@@ -1,10 +1,11 @@
-import requests
 import json
 import re
-from bs4 import BeautifulSoup
 import os
 import sys
 
+from trekcore_http import http_get
+from trekcore_parsing import parse_html
+
 # Mapeo de slugs internos a slugs de startrek.com
 SERIES_MAPPING = {
     "star-trek-deep-space-nine": "deep-space-nine",
@@ -77,7 +78,7 @@ def scrape_series_cast(external_slug):
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     }
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_get(url, headers=headers, timeout=15)
         if response.status_code != 200:
             print(f"Error: status code {response.status_code}")
             return []
@@ -87,7 +88,7 @@ def scrape_series_cast(external_slug):
 
     html = response.text
     results = []
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = parse_html(html)
     
     items = soup.find_all(class_=re.compile("Characters_character"))
     
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Descubrimiento de álbumes Coppermine de TrekCore.
+Recorre una sola vez el índice de la galería ({base_url}/gallery/index.php) y sus
+categorías (index.php?cat=N) para relacionar cada álbum (thumbnails.php?album=N) con su
+episodio. Así los scrapers van directamente a la galería sin descargar la página del
+episodio; los episodios sin álbum identificado siguen usando la página del episodio.
+
+El recorrido cuesta decenas de peticiones, así que el mapa de álbumes de cada sitio se
+guarda en disco (ALBUMS_DIR) y se reutiliza durante ALBUMS_MAX_AGE. Si está caducado y
+hay menos de MIN_DISCOVERY_JOBS episodios, no compensa volver a recorrerlo: se usa el mapa
+anterior (un álbum nuevo que no aparezca en él se alcanza por la página del episodio).
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urljoin
+
+from trekcore_cache import CACHE_DIR
+from trekcore_parsing import parse_html
+
+GALLERY_INDEX = 'gallery/index.php'
+MAX_CATEGORY_PAGES = 300    # Tope de páginas de categoría por sitio
+ALBUMS_DIR = os.path.join(CACHE_DIR, 'albums')
+ALBUMS_MAX_AGE = 7 * 24 * 3600  # Segundos que se reutiliza un mapa de álbumes
+MIN_DISCOVERY_JOBS = 10         # Episodios a partir de los que compensa recorrer la galería
+
+CATEGORY_PATTERN = re.compile(r'index\.php\?cat=(\d+)(?:&page=\d+)?$')
+ALBUM_PATTERN = re.compile(r'thumbnails\.php\?album=(\d+)$')
+
+# Prefijos de numeración de los álbumes: '109: "Título"', '101-102: ...', '1x07 - Título', ...
+ALBUM_PREFIX_PATTERN = re.compile(r'^\s*(?:\d+x\d+|\d+(?:\s*-\s*\d+)?)\s*[:.\-]\s*')
+ALBUM_EPISODE_PATTERN = re.compile(
+    r'^\s*(?:(\d+)x(\d+)\b|(\d{3,4})(?:\s*-\s*(\d{3,4}))?\s*[:.])'
+)
+
+def normalize_title(title):
+    """Título comparable: sin numeración, comillas, puntuación ni mayúsculas"""
+    title = ALBUM_PREFIX_PATTERN.sub('', title or '').lower().replace('&', ' and ')
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', title).split())
+
+def episode_number(season, episode):
+    return f"S{int(season)}E{int(episode):02d}"
+
+def album_episode_numbers(title):
+    """Episodios (S1E09) que indica la numeración del nombre de un álbum: '1x09 - Título',
+    '109: "Título"' (temporada + episodio) o '101-102: ...' (episodio doble)"""
+    match = ALBUM_EPISODE_PATTERN.match(title or '')
+    if not match:
+        return []
+    if match.group(1):
+        return [episode_number(match.group(1), match.group(2))]
+    first, last = match.group(3), match.group(4) or match.group(3)
+    if first[:-2] != last[:-2] or int(last[-2:]) < int(first[-2:]):
+        return [episode_number(first[:-2], first[-2:])]
+    return [episode_number(first[:-2], number) for number in range(int(first[-2:]), int(last[-2:]) + 1)]
+
+def discover_albums(base_url, fetch, max_pages=MAX_CATEGORY_PAGES, log=print):
+    """Recorre el índice de la galería y sus categorías.
+    fetch(url) debe devolver el HTML de la página. Devuelve una lista de álbumes
+    {'album_id', 'url', 'title', 'categories'} en el orden en que aparecen."""
+    index_url = f"{base_url.rstrip('/')}/{GALLERY_INDEX}"
+    gallery_dir = index_url.rsplit('/', 1)[0] + '/'
+
+    albums = {}
+    category_names = {}
+    pending = deque([(index_url, ())])
+    visited = {index_url}
+
+    while pending and len(visited) <= max_pages:
+        page_url, path = pending.popleft()
+        try:
+            soup = parse_html(fetch(page_url), 'links')
+        except Exception as e:
+            log(f"    ⚠️ Error leyendo categoría {page_url}: {e}")
+            continue
+
+        for link in soup.find_all('a', href=True):
+            url = urljoin(page_url, link['href'].replace('&amp;', '&'))
+            if not url.startswith(gallery_dir):
+                continue
+            relative = url[len(gallery_dir):]
+            text = link.get_text(' ', strip=True)
+
+            album_match = ALBUM_PATTERN.match(relative)
+            if album_match:
+                album = albums.setdefault(url, {
+                    'album_id': int(album_match.group(1)),
+                    'url': url,
+                    'title': '',
+                    'categories': list(path)
+                })
+                # Las miniaturas enlazan al álbum sin texto: el nombre viene en otro enlace
+                if text and not album['title']:
+                    album['title'] = text
+                continue
+
+            category_match = CATEGORY_PATTERN.match(relative)
+            if category_match:
+                cat_id = category_match.group(1)
+                if text and not text.isdigit() and cat_id not in category_names:
+                    category_names[cat_id] = text
+                if url not in visited:
+                    visited.add(url)
+                    # Las páginas 2..N de una categoría heredan la ruta de la página 1
+                    name = category_names.get(cat_id)
+                    pending.append((url, path + (name,) if name and name not in path else path))
+
+    if pending:
+        log(f"    ⚠️ Límite de {max_pages} páginas de categoría alcanzado en {base_url}")
+    return list(albums.values())
+
+def _pick_album(candidates, keywords):
+    """El candidato inequívoco: el único, o el único que contiene la primera keyword que
+    aparece en alguno (en su nombre o categoría). None si es ambiguo"""
+    if len(candidates) == 1:
+        return candidates[0]
+    for keyword in keywords:
+        preferred = [
+            album for album in candidates
+            if keyword in ' '.join([album['title']] + album['categories']).lower()
+        ]
+        if preferred:
+            return preferred[0] if len(preferred) == 1 else None
+    return None
+
+def match_albums(jobs, albums, keywords=()):
+    """Asocia a cada trabajo (episodio) la URL de su álbum.
+    Primero por la numeración del nombre del álbum (1x07, 109:, 101-102:) y, si no la tiene,
+    por el título real del episodio ('real_title', de __episodes.json) normalizado y exacto.
+    Si hay varios candidatos se prefiere el que contiene alguna de las keywords; si sigue
+    siendo ambiguo (o el título lo comparten varios episodios) el episodio no se asocia y
+    se usa su página. Devuelve {episode_number: album_url}."""
+    by_title = {}
+    by_number = {}
+    for album in albums:
+        numbers = album_episode_numbers(album['title'])
+        for number in numbers:
+            by_number.setdefault(number, []).append(album)
+        title = normalize_title(album['title'])
+        if title and not numbers:
+            by_title.setdefault(title, []).append(album)
+
+    # Un título que comparten varios episodios no identifica a ninguno
+    job_titles = {}
+    for job in jobs:
+        title = normalize_title(job.get('real_title'))
+        if title:
+            job_titles[title] = job_titles.get(title, 0) + 1
+
+    matches = {}
+    for job in jobs:
+        candidates = by_number.get(job['episode_number'])
+        if not candidates:
+            title = normalize_title(job.get('real_title'))
+            candidates = by_title.get(title) if title and job_titles[title] == 1 else None
+        if not candidates:
+            continue
+        album = _pick_album(candidates, keywords)
+        if album is not None:
+            matches[job['episode_number']] = album['url']
+    return matches
+
+def _albums_path(base_url, albums_dir):
+    key = hashlib.sha1(base_url.rstrip('/').encode('utf-8')).hexdigest()
+    return os.path.join(albums_dir, f"{key}.json")
+
+def load_albums(base_url, albums_dir=None):
+    """Mapa de álbumes guardado del sitio: (álbumes, antigüedad en segundos) o (None, None)"""
+    try:
+        with open(_albums_path(base_url, albums_dir or ALBUMS_DIR), 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        return saved['albums'], time.time() - saved['saved_at']
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+def save_albums(base_url, albums, albums_dir=None):
+    path = _albums_path(base_url, albums_dir or ALBUMS_DIR)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'base_url': base_url, 'saved_at': time.time(), 'albums': albums}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def site_albums(base_url, fetch, jobs_count, log=print):
+    """Álbumes del sitio: el mapa guardado si es reciente (o si no compensa recorrer la
+    galería para jobs_count episodios); si no, se recorre y se guarda. None si no hay mapa"""
+    albums, age = load_albums(base_url)
+    if albums is not None and age < ALBUMS_MAX_AGE:
+        return albums
+    if jobs_count < MIN_DISCOVERY_JOBS:
+        if albums is None:
+            log(f"  🗂️  {jobs_count} episodios: sin mapa de álbumes, se usa la página de cada episodio")
+        return albums
+    log(f"  🗂️  Descubriendo álbumes en {base_url}/{GALLERY_INDEX}...")
+    discovered = discover_albums(base_url, fetch, log=log)
+    if discovered:
+        save_albums(base_url, discovered)
+        return discovered
+    return albums
+
+def attach_albums(jobs, base_url, fetch, keywords=(), log=print):
+    """Añade 'gallery_url' a los trabajos cuyo álbum se identifica en el mapa del sitio"""
+    if not jobs:
+        return jobs
+    albums = site_albums(base_url, fetch, len(jobs), log=log)
+    if not albums:
+        return jobs
+    matches = match_albums(jobs, albums, keywords)
+    for job in jobs:
+        if job['episode_number'] in matches:
+            job['gallery_url'] = matches[job['episode_number']]
+    log(f"  🗂️  {len(albums)} álbumes, {len(matches)}/{len(jobs)} episodios con galería directa")
+    return jobs
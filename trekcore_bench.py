@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks del parseo y del pipeline sobre los HTML de ejemplo del repositorio
+(trekcore_page.html, trekcore_legacy_page.html, gallery_sample.html).
+
+Mide páginas (o elementos) por segundo y memoria pico (tracemalloc) de cada paso:
+  - index_rows:      filas del índice de episodios (tabla col1/col2 y enlaces legacy)
+  - episode_number:  extract_episode_number_from_text sobre los textos de col1
+  - gallery_images:  extracción de imágenes de una página de galería (streaming y soup)
+  - screencaps_merge: rewrite_screencaps con 1k / 10k / 100k episodios sintéticos
+  - screencaps_index: memoria del índice completo que carga la publicación (dicts frente
+                      a ScreencapsIndex)
+
+El resultado se imprime como JSON (o se guarda con --output) para comparar backends y
+detectar regresiones:
+
+    python3 trekcore_bench.py
+    python3 trekcore_bench.py --backends lxml,html.parser --sizes 1000,10000 --output bench.json
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import trekcore_parsing
+import trekcore_scraper as cron_scraper
+import trekcore_scraper_legacy as legacy_scraper
+from trekcore_gallery import stream_gallery_page
+from trekcore_journal import iter_screencaps, record_key, rewrite_screencaps
+from trekcore_links import classify_links
+from trekcore_records import ScreencapsIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = {
+    'index': os.path.join(BASE_DIR, 'trekcore_page.html'),
+    'legacy_index': os.path.join(BASE_DIR, 'trekcore_legacy_page.html'),
+    'gallery': os.path.join(BASE_DIR, 'gallery_sample.html'),
+}
+
+# Configuración por defecto
+MIN_SECONDS = 1.0               # Tiempo mínimo de medición por paso
+MERGE_SIZES = (1000, 10000, 100000)
+SCREENCAPS_PER_EPISODE = 5      # URLs por episodio en los datos sintéticos
+GALLERY_URL = 'https://tos.trekcore.com/gallery/thumbnails.php?album=193'
+
+SERIES_INFO = {
+    'base_url': 'https://academy.trekcore.com',
+    'episodes_url': 'https://academy.trekcore.com/episodes/',
+    'name': 'Benchmark'
+}
+
+def _quiet(message):
+    return None
+
+def measure(func, min_seconds=MIN_SECONDS):
+    """Ejecuta func() repetidamente durante min_seconds. Devuelve (ejecuciones/s, memoria pico en KB)"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+
+    # Memoria pico en una ejecución aparte (tracemalloc ralentiza la medición de tiempo)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return runs / elapsed, round(peak / 1024, 1)
+
+def bench_index_rows(backend, content, legacy_content):
+    """Filas del índice: tabla col1/col2 (scraper continuo) y enlaces de episodios (legacy)"""
+    results = []
+    rows = len(cron_scraper.parse_series_index(content, 'benchmark', SERIES_INFO))
+    rate, peak = measure(lambda: cron_scraper.parse_series_index(content, 'benchmark', SERIES_INFO))
+    results.append({
+        'step': 'index_rows', 'fixture': 'trekcore_page.html', 'backend': backend,
+        'items': rows, 'pages_per_second': round(rate, 1), 'peak_memory_kb': peak
+    })
+
+    def legacy_links():
+        return classify_links(trekcore_parsing.parse_html(legacy_content, 'links'))['episodes']
+    links = len(legacy_links())
+    rate, peak = measure(legacy_links)
+    results.append({
+        'step': 'index_rows', 'fixture': 'trekcore_legacy_page.html', 'backend': backend,
+        'items': links, 'pages_per_second': round(rate, 1), 'peak_memory_kb': peak
+    })
+    return results
+
+def bench_episode_number(legacy_content):
+    """extract_episode_number_from_text sobre todas las celdas col1 del índice legacy"""
+    soup = trekcore_parsing.parse_html(legacy_content, 'series_index')
+    texts = [cell.text.strip() for cell in soup.find_all('td', class_='col1')]
+
+    def run():
+        for text in texts:
+            legacy_scraper.extract_episode_number_from_text(text)
+    rate, peak = measure(run)
+    return [{
+        'step': 'episode_number', 'fixture': 'trekcore_legacy_page.html', 'backend': None,
+        'items': len(texts), 'pages_per_second': round(rate, 1),
+        'items_per_second': round(rate * len(texts), 1), 'peak_memory_kb': peak
+    }]
+
+def bench_gallery(backend, content):
+    """Imágenes de una página de galería: extractor en streaming y BeautifulSoup"""
+    results = []
+    chunk = 16 * 1024
+
+    def streaming():
+        chunks = (content[i:i + chunk] for i in range(0, len(content), chunk))
+        return stream_gallery_page(chunks, GALLERY_URL, lambda data: ([], 1))[0]
+
+    def soup():
+        return legacy_scraper.parse_gallery_soup(content, GALLERY_URL)[0]
+
+    for name, func in (('stream', streaming), ('soup', soup)):
+        if name == 'stream' and backend != trekcore_parsing.DEFAULT_BACKEND:
+            continue  # El extractor en streaming no depende del backend
+        images = len(func())
+        rate, peak = measure(func)
+        results.append({
+            'step': 'gallery_images', 'fixture': 'gallery_sample.html',
+            'backend': 'html.parser (stream)' if name == 'stream' else backend,
+            'items': images, 'pages_per_second': round(rate, 1), 'peak_memory_kb': peak
+        })
+    return results
+
+def synthetic_screencaps(size):
+    """Datos sintéticos con el formato de __screencaps.json"""
+    screencaps = []
+    for i in range(size):
+        series = f"series-{i // 1000}"
+        number = f"S{(i % 1000) // 100 + 1}E{i % 100:02d}"
+        screencaps.append({
+            'series_slug': series,
+            'episode_number': number,
+            'episode_title': f"Episode {i}",
+            'screencaps': [
+                f"https://tos.trekcore.com/gallery/albums/screencaps/{series}/{number}/cap-{j:03d}.jpg"
+                for j in range(SCREENCAPS_PER_EPISODE)
+            ],
+            'source': 'benchmark',
+            'scraped_at': datetime.now().isoformat()
+        })
+    return {'screencaps': screencaps, 'last_updated': None, 'total_episodes': size}
+
+def bench_merge(sizes):
+    """rewrite_screencaps (compactación del diario) fusionando un episodio nuevo en un fichero
+    de N episodios"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, '__screencaps.json')
+        for size in sizes:
+            data = synthetic_screencaps(size)
+            new_item = dict(data['screencaps'][0], episode_title='Updated')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            del data
+            file_kb = round(os.path.getsize(path) / 1024, 1)
+
+            # Con ficheros grandes basta una ejecución
+            rate, peak = measure(lambda: rewrite_screencaps(path, [new_item]),
+                                 min_seconds=MIN_SECONDS if size <= 10000 else 0)
+            results.append({
+                'step': 'screencaps_merge', 'fixture': f"synthetic-{size}", 'backend': None,
+                'items': size, 'file_kb': file_kb, 'merges_per_second': round(rate, 2),
+                'seconds_per_merge': round(1 / rate, 4), 'peak_memory_kb': peak
+            })
+    return results
+
+def _retained_kb(build):
+    """Memoria (KB) que sigue ocupando el resultado de build()"""
+    tracemalloc.start()
+    try:
+        result = build()
+        current = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return round(current / 1024, 1)
+
+def bench_index(sizes):
+    """Índice completo en memoria: dicts de __screencaps.json frente a ScreencapsIndex
+    (slots, cadenas internadas, URLs como prefijo + nombre). La tabla de prefijos y los objetos tienen un coste fijo: con pocos episodios el índice
+    puede ocupar más que los dicts (index_vs_dicts > 1)"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, '__screencaps.json')
+        for size in sizes:
+            data = synthetic_screencaps(size)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            del data
+
+            dicts_kb = _retained_kb(lambda: {record_key(record): record for record in iter_screencaps(path)})
+            index_kb = _retained_kb(lambda: ScreencapsIndex.load(path))
+            results.append({
+                'step': 'screencaps_index', 'fixture': f"synthetic-{size}", 'backend': None,
+                'items': size, 'dicts_kb': dicts_kb, 'index_kb': index_kb,
+                'index_vs_dicts': round(index_kb / dicts_kb, 2) if dicts_kb else None
+            })
+    return results
+
+def _arg_value(flag, default):
+    """Valor de un argumento --flag VALOR (o default)"""
+    if flag in sys.argv:
+        index = sys.argv.index(flag)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+def run_benchmarks(backends, sizes):
+    """Ejecuta todos los pasos y devuelve el informe"""
+    with open(FIXTURES['index'], 'rb') as f:
+        index_content = f.read()
+    with open(FIXTURES['legacy_index'], 'rb') as f:
+        legacy_content = f.read()
+    with open(FIXTURES['gallery'], 'rb') as f:
+        gallery_content = f.read()
+
+    results = []
+    original_backend = trekcore_parsing.PARSER_BACKEND
+    try:
+        for backend in backends:
+            trekcore_parsing.set_backend(backend)
+            results.extend(bench_index_rows(backend, index_content, legacy_content))
+            results.extend(bench_gallery(backend, gallery_content))
+        trekcore_parsing.set_backend(original_backend)
+        results.extend(bench_episode_number(legacy_content))
+        results.extend(bench_merge(sizes))
+        results.extend(bench_index(sizes))
+    finally:
+        trekcore_parsing.set_backend(original_backend)
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backends': backends,
+        'results': results
+    }
+
+def main():
+    """Uso: trekcore_bench.py [--backends lxml,html.parser] [--sizes 1000,10000,100000] [--output FICHERO]"""
+    backends = _arg_value('--backends', ','.join(dict.fromkeys([trekcore_parsing.DEFAULT_BACKEND, 'html.parser'])))
+    sizes = _arg_value('--sizes', ','.join(str(size) for size in MERGE_SIZES))
+    output = _arg_value('--output', None)
+
+    # Los scrapers registran cada paso en su log: en el benchmark no se escribe nada
+    cron_scraper.log = _quiet
+    legacy_scraper.log = _quiet
+
+    report = run_benchmarks(
+        [backend for backend in backends.split(',') if backend],
+        [int(size) for size in sizes.split(',') if size]
+    )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == "__main__":
+    main()
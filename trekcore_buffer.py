@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Buffer write-behind para los registros de los scrapers.
+Los episodios procesados se acumulan en memoria y se vuelcan en lote (flush) cada
+FLUSH_EPISODES episodios, cuando el lote supera FLUSH_SECONDS (un temporizador lo vuelca
+aunque no lleguen más episodios), al terminar y al recibir SIGINT / SIGTERM. Quien lo usa decide cómo se vuelca un lote (diario, SQLite...);
+un flush interrumpido por una señal se completa antes de salir.
+
+La compactación (reescribir __screencaps.json y __episodes.json) es mucho más cara que un
+volcado, así que va aparte: compact_func se llama cada COMPACT_EPISODES episodios volcados
+o COMPACT_SECONDS segundos, y una última vez con compact() al terminar o al recibir una señal.
+"""
+
+import signal
+import threading
+import time
+
+# Configuración
+FLUSH_EPISODES = 25     # Episodios por lote
+FLUSH_SECONDS = 60      # Antigüedad máxima de un lote sin volcar
+COMPACT_EPISODES = 250  # Episodios volcados entre compactaciones
+COMPACT_SECONDS = 600   # Tiempo máximo entre compactaciones
+
+class WriteBehindBuffer:
+    """Acumula registros y llama a flush_func(registros) por lotes y, de vez en cuando,
+    a compact_func()"""
+
+    def __init__(self, flush_func, max_items=None, max_seconds=None, log=None,
+                 compact_func=None, compact_items=None, compact_seconds=None):
+        self.flush_func = flush_func
+        self.max_items = FLUSH_EPISODES if max_items is None else max_items
+        self.max_seconds = FLUSH_SECONDS if max_seconds is None else max_seconds
+        self.compact_func = compact_func
+        self.compact_items = COMPACT_EPISODES if compact_items is None else compact_items
+        self.compact_seconds = COMPACT_SECONDS if compact_seconds is None else compact_seconds
+        self.log = log
+        self._uncompacted = 0   # Episodios volcados desde la última compactación
+        self._compacted_at = time.monotonic()
+        self._items = []
+        self._first_at = None
+        self._timer = None      # Vuelca el lote al cumplir max_seconds
+        self._lock = threading.RLock()
+        self._flushing = None   # Hilo que está volcando (o None)
+        self._pending_signal = None
+
+    def add(self, record):
+        """Añade un registro y vuelca el lote si está lleno o es demasiado antiguo"""
+        with self._lock:
+            if not self._items:
+                self._first_at = time.monotonic()
+            self._items.append(record)
+            due = (len(self._items) >= self.max_items
+                   or time.monotonic() - self._first_at >= self.max_seconds)
+            if not due and self._timer is None:
+                self._schedule(self.max_seconds)
+        if due:
+            self.flush()
+
+    def _schedule(self, delay):
+        timer = threading.Timer(delay, self._flush_expired)
+        timer.daemon = True
+        self._timer = timer
+        timer.start()
+
+    def _flush_expired(self):
+        """Temporizador: vuelca el lote si ya supera max_seconds (si no, vuelve a programarse)"""
+        with self._lock:
+            if self._timer is not threading.current_thread():
+                return  # Cancelado: el lote ya se volcó
+            self._timer = None
+            if self._first_at is None:
+                return
+            remaining = self.max_seconds - (time.monotonic() - self._first_at)
+            if remaining > 0:
+                self._schedule(remaining)
+                return
+            try:
+                self.flush()
+            except Exception as e:
+                if self.log:
+                    self.log(f"❌ Error volcando {len(self._items)} episodios pendientes: {e}")
+
+    def flush(self):
+        """Vuelca los registros pendientes. Devuelve cuántos se volcaron"""
+        with self._lock:
+            if self._flushing or not self._items:
+                return 0
+            items, self._items = self._items, []
+            first_at, self._first_at = self._first_at, None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flushing = threading.get_ident()
+            try:
+                try:
+                    self.flush_func(items)
+                except BaseException:
+                    # El lote vuelve al buffer para el siguiente intento (el temporizador lo
+                    # reintenta pasados max_seconds aunque no lleguen más episodios)
+                    self._items = items + self._items
+                    self._first_at = first_at
+                    self._schedule(self.max_seconds)
+                    raise
+                self._uncompacted += len(items)
+                if (self._uncompacted >= self.compact_items
+                        or time.monotonic() - self._compacted_at >= self.compact_seconds):
+                    self._compact()
+            finally:
+                self._flushing = None
+                pending_signal, self._pending_signal = self._pending_signal, None
+            if pending_signal is not None:
+                self.compact()
+                self._raise_signal(pending_signal)
+            return len(items)
+
+    def compact(self):
+        """Vuelca lo pendiente y compacta (al terminar la ejecución o al recibir una señal)"""
+        with self._lock:
+            self.flush()
+            if self._flushing:
+                return
+            self._flushing = threading.get_ident()
+            try:
+                self._compact()
+            finally:
+                self._flushing = None
+                pending_signal, self._pending_signal = self._pending_signal, None
+            if pending_signal is not None:
+                self._raise_signal(pending_signal)
+
+    def _compact(self):
+        if self.compact_func:
+            self.compact_func()
+        self._uncompacted = 0
+        self._compacted_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._items)
+
+    def install_signal_handlers(self, signals=(signal.SIGINT, signal.SIGTERM)):
+        """Vuelca el buffer al recibir las señales (solo desde el hilo principal)"""
+        self._previous_handlers = {}
+        for signum in signals:
+            self._previous_handlers[signum] = signal.getsignal(signum)
+            signal.signal(signum, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        if self._flushing == threading.get_ident():
+            # La señal interrumpió un volcado de este hilo: se termina y después se sale
+            self._pending_signal = signum
+            return
+        if self._items and self.log:
+            self.log(f"🛑 Señal {signal.Signals(signum).name}: guardando {len(self._items)} episodios pendientes...")
+        self.compact()
+        self._raise_signal(signum)
+
+    def _raise_signal(self, signum):
+        previous = getattr(self, '_previous_handlers', {}).get(signum)
+        if callable(previous) and previous is not signal.default_int_handler:
+            previous(signum, None)
+        elif signum == signal.SIGINT:
+            raise KeyboardInterrupt
+        else:
+            raise SystemExit(128 + signum)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Caché HTTP en disco con peticiones condicionales (ETag / Last-Modified).
+Guarda cuerpo y validadores de cada URL; en la siguiente ejecución se envían
+If-None-Match / If-Modified-Since y, si el servidor responde 304, se reutiliza
+el cuerpo guardado y también el resultado ya parseado (cached_parse).
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache')
+
+# Versión de los parseos guardados: súbela al cambiar cualquier parser (o su formato de
+# salida) para que las páginas que respondan 304 se vuelvan a parsear
+PARSE_VERSION = 2
+
+# Cabeceras de la respuesta original que se conservan en la entrada
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+class HttpCache:
+    """Caché de respuestas por URL: <sha1>.json (validadores + parseos) y <sha1>.body"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.body'
+
+    def _write(self, path, data, binary=False):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if binary:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_entry(self, url):
+        """Devuelve los metadatos guardados de la URL (o None)"""
+        meta_path, body_path = self._paths(url)
+        if not os.path.exists(meta_path) or not os.path.exists(body_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, url):
+        """Cabeceras If-None-Match / If-Modified-Since para la URL"""
+        entry = self.load_entry(url)
+        headers = {}
+        if entry:
+            if entry['headers'].get('ETag'):
+                headers['If-None-Match'] = entry['headers']['ETag']
+            if entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def delete(self, url):
+        """Borra la entrada de la URL (metadatos primero: sin ellos el cuerpo no se usa)"""
+        with self._lock:
+            for path in self._paths(url):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def store(self, url, response):
+        """Guarda una respuesta 200 que traiga validadores. Si no los trae, se borra la
+        entrada anterior (sus validadores y parseos ya no corresponden a la página)"""
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        if 'ETag' not in headers and 'Last-Modified' not in headers:
+            self.delete(url)
+            return
+        meta_path, body_path = self._paths(url)
+        with self._lock:
+            # Sin metadatos la entrada no existe: un corte a mitad nunca empareja un cuerpo
+            # nuevo con los validadores del anterior. Los metadatos se escriben los últimos
+            try:
+                os.remove(meta_path)
+            except FileNotFoundError:
+                pass
+            self._write(body_path, response.content, binary=True)
+            self._write(meta_path, {'url': url, 'headers': headers, 'parsed': {}})
+
+    def resolve(self, url, response):
+        """Procesa la respuesta de una petición condicional.
+        Un 304 se sustituye por la respuesta guardada (from_cache=True)."""
+        if response.status_code == 304:
+            entry = self.load_entry(url)
+            if entry:
+                meta_path, body_path = self._paths(url)
+                with open(body_path, 'rb') as f:
+                    body = f.read()
+                cached = requests.models.Response()
+                cached.status_code = 200
+                cached._content = body
+                cached.headers = CaseInsensitiveDict(entry['headers'])
+                cached.url = url
+                cached.request = response.request
+                cached.encoding = response.encoding
+                cached.from_cache = True
+                cached.cache_url = url
+                return cached
+        elif response.status_code == 200:
+            self.store(url, response)
+        response.from_cache = False
+        response.cache_url = url
+        return response
+
+    def cached_parse(self, response, name, parse):
+        """Devuelve parse(), reutilizando el resultado guardado si la respuesta es un 304 y
+        se parseó con la misma PARSE_VERSION. El resultado debe ser serializable a JSON.
+        Las respuestas de --replay no salen de la caché: se parsean y no se guardan"""
+        if getattr(response, 'replayed', False):
+            return parse()
+        url = getattr(response, 'cache_url', response.url)
+        key = f"{name}@{PARSE_VERSION}"
+        entry = self.load_entry(url)
+        if getattr(response, 'from_cache', False) and entry and key in entry['parsed']:
+            return entry['parsed'][key]
+
+        result = parse()
+        if entry:
+            with self._lock:
+                # Los parseos de versiones anteriores ya no se van a usar
+                entry['parsed'] = {
+                    stored: value for stored, value in entry['parsed'].items()
+                    if stored.endswith(f"@{PARSE_VERSION}")
+                }
+                entry['parsed'][key] = result
+                self._write(self._paths(url)[0], entry)
+        return result
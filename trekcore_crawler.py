@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Motor de crawling concurrente (asyncio) para los scrapers de TrekCore.
+Ejecuta todas las series a la vez, limitando la concurrencia global y por subdominio.
+
+Los scrapers aportan dos funciones:
+  - list_episodes(series_slug, series_info) -> lista de trabajos (dicts con 'episode_url')
+  - process_episode(job) -> registro de screencaps (dict) o None
+Ambas son bloqueantes (requests) y se ejecutan en hilos, igual que on_record(registro)
+(escrituras del diario / JSON), que se llama de uno en uno.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import urlparse
+
+# Límites por defecto
+MAX_CONCURRENCY = 8   # Trabajos simultáneos en toda la ejecución
+MAX_PER_HOST = 2      # Trabajos simultáneos por subdominio (tos.trekcore.com, tng.trekcore.com...)
+# El ritmo de peticiones por subdominio lo marca el limitador de trekcore_http
+
+_current = threading.local()
+
+class HostSlots:
+    """Huecos de concurrencia por subdominio, compartidos entre hilos. Cada trabajo ocupa uno
+    mientras se ejecuta y puede tomar prestados los que estén libres (sin esperar) para
+    descargar en paralelo las páginas de una galería"""
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._used = {}
+        self._cond = threading.Condition()
+
+    def borrow(self, host, wanted):
+        """Ocupa hasta wanted huecos libres del host. Devuelve cuántos consiguió"""
+        with self._cond:
+            borrowed = max(0, min(wanted, self.max_per_host - self._used.get(host, 0)))
+            self._used[host] = self._used.get(host, 0) + borrowed
+            return borrowed
+
+    def release(self, host, count=1):
+        if count:
+            with self._cond:
+                self._used[host] -= count
+                self._cond.notify_all()
+
+    def call(self, url, func, *args):
+        """Espera un hueco del host de url y ejecuta func(*args) en este hilo"""
+        host = urlparse(url).netloc
+        with self._cond:
+            while self._used.get(host, 0) >= self.max_per_host:
+                self._cond.wait()
+            self._used[host] = self._used.get(host, 0) + 1
+        _current.slots = self
+        try:
+            return func(*args)
+        finally:
+            _current.slots = None
+            self.release(host)
+
+@contextmanager
+def extra_host_slots(url, wanted):
+    """Huecos extra del host de url para el trabajo del motor que se ejecuta en este hilo
+    (los libres en ese momento, como mucho wanted); se devuelven al salir del bloque.
+    Fuera del motor concurrente no hay límite por host: devuelve wanted"""
+    slots = getattr(_current, 'slots', None)
+    if slots is None:
+        yield max(wanted, 0)
+        return
+    host = urlparse(url).netloc
+    borrowed = slots.borrow(host, wanted)
+    try:
+        yield borrowed
+    finally:
+        slots.release(host, borrowed)
+
+class CrawlEngine:
+    """Ejecuta los trabajos de scraping en paralelo respetando límites de concurrencia"""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST, log=print):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.log = log
+        self._global_slots = asyncio.Semaphore(max_concurrency)
+        self._host_queues = {}     # {host: asyncio.Semaphore}: turno de cada trabajo en su host
+        self._host_slots = HostSlots(max_per_host)
+        self._record_lock = asyncio.Lock()
+        self._executor = None   # Hilos propios durante crawl_all (si no, los de asyncio)
+
+    def _to_thread(self, func, *args):
+        """Ejecuta func(*args) en un hilo del motor sin bloquear el event loop"""
+        if self._executor is None:
+            return asyncio.to_thread(func, *args)
+        return asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    async def run(self, url, func, *args):
+        """Ejecuta func(*args) en un hilo ocupando un hueco global y otro del host de url.
+        Primero se espera turno en el host (sin ocupar hueco global): los trabajos de un
+        host saturado no bloquean los huecos globales que pueden usar los demás hosts"""
+        host = urlparse(url).netloc
+        host_queue = self._host_queues.get(host)
+        if host_queue is None:
+            host_queue = self._host_queues[host] = asyncio.Semaphore(self.max_per_host)
+        async with host_queue:
+            async with self._global_slots:
+                return await self._to_thread(self._host_slots.call, url, func, *args)
+
+    async def _crawl_episode(self, job, process_episode, on_record):
+        record = await self.run(job['episode_url'], process_episode, job)
+        # on_record escribe en disco: se ejecuta en un hilo, de uno en uno (escrituras serializadas)
+        if record and on_record:
+            async with self._record_lock:
+                await self._to_thread(on_record, record)
+        return record
+
+    async def crawl_series(self, series_slug, series_info, list_episodes, process_episode, on_record=None):
+        """Procesa una serie completa y devuelve sus registros en el orden del índice"""
+        jobs = await self.run(series_info['episodes_url'], list_episodes, series_slug, series_info)
+        results = await asyncio.gather(*(
+            self._crawl_episode(job, process_episode, on_record) for job in jobs
+        ))
+        records = [record for record in results if record]
+        self.log(f"✅ {series_info['name']}: {len(records)} episodios con screencaps")
+        return records
+
+    async def crawl_all(self, series_map, list_episodes, process_episode, on_record=None):
+        """Procesa todas las series a la vez. Devuelve {series_slug: [registros]}"""
+        # Un hilo por trabajo simultáneo más uno para on_record; se cierran al terminar
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency + 1)
+        try:
+            results = await asyncio.gather(*(
+                self.crawl_series(slug, info, list_episodes, process_episode, on_record)
+                for slug, info in series_map.items()
+            ))
+        finally:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=False, cancel_futures=True)
+        return dict(zip(series_map, results))
+
+def crawl(series_map, list_episodes, process_episode, on_record=None, **limits):
+    """Punto de entrada síncrono del motor concurrente"""
+    async def _main():
+        engine = CrawlEngine(**limits)
+        return await engine.crawl_all(series_map, list_episodes, process_episode, on_record)
+    return asyncio.run(_main())
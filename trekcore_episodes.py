@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Metadatos de __episodes.json para resolver títulos de episodios.
+El fichero se carga una sola vez por ejecución y se indexa por (seriesSlug, number); solo
+se vuelve a leer si cambia su mtime (por ejemplo, si otro proceso lo actualiza). Los ids
+de screencaps se enlazan en gallery[] solo en los episodios que cambiaron, con una escritura.
+"""
+
+import threading
+
+from trekcore_journal import write_json_atomic
+from trekcore_jsonstream import load
+from trekcore_lock import file_lock, file_version
+
+class EpisodeMetadata:
+    """Índice {(seriesSlug, number): episodio} de __episodes.json"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = None   # (mtime, tamaño, inodo) del fichero cargado
+        self._index = {}
+        self._data = None
+
+    def _refresh(self):
+        """Recarga el índice si el fichero cambió desde la última lectura"""
+        version = file_version(self.path)
+        with self._lock:
+            if version != self._version:
+                data = None
+                if version is not None:
+                    try:
+                        data = load(self.path)
+                    except (OSError, ValueError):
+                        data = None
+                index = {}
+                for episode in (data or {}).get('episodes', []):
+                    index[(episode.get('seriesSlug'), episode.get('number'))] = episode
+                self._data = data
+                self._index = index
+                self._version = version
+            return self._index
+
+    def resolve_titles(self, jobs):
+        """Añade 'real_title' (o None) a todos los trabajos de una serie en una sola pasada"""
+        index = self._refresh()
+        for job in jobs:
+            episode = index.get((job['series_slug'], job['episode_number']))
+            job['real_title'] = episode.get('title') if episode else None
+        return jobs
+
+    def link_gallery(self, links):
+        """Añade a gallery[] los ids de screencaps {(seriesSlug, number): id} tocando solo esos
+        episodios, y guarda __episodes.json una sola vez (si algo cambió).
+        Devuelve cuántos episodios cambiaron, o None si no se pudo cargar el fichero"""
+        # Bajo bloqueo: si otro proceso lo modificó, _refresh lo vuelve a leer antes de fusionar
+        with file_lock(self.path):
+            index = self._refresh()
+            with self._lock:
+                if not self._data:
+                    return None
+                updated_count = 0
+                for key, screencap_id in links.items():
+                    episode = index.get(key)
+                    if episode is None:
+                        continue
+                    gallery = episode.setdefault('gallery', [])
+                    if screencap_id not in gallery:
+                        gallery.append(screencap_id)
+                        updated_count += 1
+                if updated_count:
+                    write_json_atomic(self.path, self._data)
+                    self._version = file_version(self.path)
+                return updated_count
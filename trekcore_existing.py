@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Índice en memoria de los episodios que ya tienen screencaps.
+Se carga una sola vez por ejecución (del JSON + diario o de la base de datos SQLite) y se
+mantiene al día con cada registro guardado, de modo que comprobar si un episodio ya existe
+es una búsqueda O(1) en un set, sin leer ni parsear ningún fichero.
+"""
+
+import threading
+
+def episode_key(series_slug, episode_number):
+    return (series_slug, episode_number)
+
+class ExistenceIndex:
+    """Set de (series_slug, episode_number) con screencaps, compartido por toda la ejecución"""
+
+    def __init__(self, loader):
+        # loader() devuelve los registros (o claves) existentes; se llama al primer uso
+        self._loader = loader
+        self._keys = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._keys is None:
+                keys = set()
+                for item in self._loader():
+                    if isinstance(item, tuple):
+                        keys.add(item)
+                    elif item.get('screencaps'):
+                        keys.add(episode_key(item['series_slug'], item['episode_number']))
+                self._keys = keys
+            return self._keys
+
+    def contains(self, series_slug, episode_number):
+        """True si el episodio ya tiene screencaps"""
+        return episode_key(series_slug, episode_number) in self._ensure_loaded()
+
+    def add(self, record):
+        """Registra un episodio recién guardado (si trae screencaps)"""
+        if record.get('screencaps'):
+            keys = self._ensure_loaded()
+            with self._lock:
+                keys.add(episode_key(record['series_slug'], record['episode_number']))
+
+    def reset(self):
+        """Olvida el índice: se vuelve a cargar en el siguiente uso"""
+        with self._lock:
+            self._keys = None
+
+    def __len__(self):
+        return len(self._ensure_loaded())
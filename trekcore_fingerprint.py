@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Huellas (fingerprints) de las tablas de episodios de cada serie.
+Se guarda un hash de la tabla completa y otro por fila: una serie cuya tabla no ha
+cambiado se salta entera, y de una tabla modificada solo se procesan las filas nuevas o
+cambiadas. Las filas pendientes (listadas pero sin galería todavía) no se reintentan en
+cada ejecución: solo si cambia su fila o cada PENDING_RECHECK_SECONDS.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+PENDING_RECHECK_SECONDS = 24 * 3600    # Frecuencia con que se reintenta una fila pendiente
+
+def fingerprint(*parts):
+    """Hash estable de una fila o tabla (partes de texto normalizadas)"""
+    text = '\x1f'.join(' '.join(str(part).split()) for part in parts)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class IndexFingerprints:
+    """Huellas por serie en un JSON: {slug: {'index': hash, 'rows': {...}, 'pending': {...}}}.
+    'rows' son las filas ya procesadas; 'pending' las que se listaron pero aún no se han
+    guardado (sin galería todavía, fallidas...), {episode_number: {'hash', 'checked_at'}}:
+    se vuelven a procesar si cambia su fila o cuando toca según PENDING_RECHECK_SECONDS."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _series(self, series_slug):
+        return self._data.setdefault(series_slug, {'index': None, 'rows': {}, 'pending': {}})
+
+    @staticmethod
+    def _pending_entry(value):
+        # Ficheros antiguos: solo el hash (se reintenta ya)
+        return value if isinstance(value, dict) else {'hash': value, 'checked_at': 0}
+
+    def _recheck_due(self, entry):
+        return time.time() - self._pending_entry(entry)['checked_at'] >= PENDING_RECHECK_SECONDS
+
+    def series_unchanged(self, series_slug, index_hash):
+        """True si la tabla es idéntica a la última vista y ninguna fila pendiente toca reintentarla"""
+        with self._lock:
+            series = self._data.get(series_slug)
+            return (bool(series) and series['index'] == index_hash
+                    and not any(self._recheck_due(entry) for entry in series['pending'].values()))
+
+    def row_waiting(self, series_slug, episode_number, row_hash):
+        """True si la fila está pendiente, no ha cambiado y aún no toca reintentarla"""
+        with self._lock:
+            series = self._data.get(series_slug)
+            entry = series and series['pending'].get(episode_number)
+            if not entry:
+                return False
+            return self._pending_entry(entry)['hash'] == row_hash and not self._recheck_due(entry)
+
+    def row_done(self, series_slug, episode_number, row_hash):
+        """True si la fila ya se procesó y no ha cambiado desde entonces"""
+        with self._lock:
+            series = self._data.get(series_slug)
+            return bool(series) and series['rows'].get(episode_number) == row_hash
+
+    def set_index(self, series_slug, index_hash, pending, waiting=()):
+        """Guarda la huella de la tabla y las filas pendientes: pending {episode_number:
+        row_hash} son las que se procesan ahora y waiting las que siguen esperando su turno"""
+        with self._lock:
+            series = self._series(series_slug)
+            series['index'] = index_hash
+            now = time.time()
+            kept = {
+                episode_number: self._pending_entry(series['pending'][episode_number])
+                for episode_number in waiting if episode_number in series['pending']
+            }
+            kept.update({
+                episode_number: {'hash': row_hash, 'checked_at': now}
+                for episode_number, row_hash in pending.items()
+            })
+            series['pending'] = kept
+            self._save()
+
+    def mark_done(self, series_slug, episode_number, row_hash=None):
+        """Marca una fila como procesada (con su hash pendiente si no se indica)"""
+        with self._lock:
+            series = self._series(series_slug)
+            pending_entry = series['pending'].pop(episode_number, None)
+            row_hash = row_hash or (pending_entry and self._pending_entry(pending_entry)['hash'])
+            if row_hash is None:
+                return
+            series['rows'][episode_number] = row_hash
+            self._save()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Frontera de crawling persistente en SQLite (reanudable).
+
+Cada URL (índice de serie o página de episodio) es una fila con estado pending,
+in_flight, done o failed, prioridad y lease: quien la toma la marca in_flight hasta
+lease_until. Si el proceso muere, sus URLs vuelven a estar disponibles al caducar el lease
+(o al arrancar, si el proceso ya no existe en esta máquina). Una ejecución reiniciada, o
+varias en paralelo sobre el mismo fichero, continúan donde se quedó la anterior sin volver
+a descargar los índices ya procesados.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from trekcore_crawler import MAX_PER_HOST, HostSlots
+
+# Configuración
+LEASE_SECONDS = 600         # Tiempo máximo que una URL puede estar in_flight
+MAX_ATTEMPTS = 3            # Intentos antes de marcar una URL como failed
+RETRY_PRIORITY_STEP = 100   # Los reintentos pasan al final de la cola
+FRONTIER_WORKERS = 8        # Hilos que consumen la frontera a la vez
+
+INDEX_PRIORITY = 0          # Los índices se procesan antes que los episodios
+EPISODE_PRIORITY = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    series_slug TEXT NOT NULL,
+    job TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    owner TEXT,
+    last_error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS frontier_queue ON frontier (state, priority, lease_until);
+"""
+
+class Frontier:
+    """Cola de trabajo persistente: pending -> in_flight -> done / failed"""
+
+    def __init__(self, path, lease_seconds=None, max_attempts=None):
+        self.path = path
+        self.lease_seconds = LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.max_attempts = MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    class _Transaction:
+        def __init__(self, db):
+            self.db = db
+
+        def __enter__(self):
+            # IMMEDIATE: reserva la escritura ya, para que dos procesos no tomen la misma URL
+            self.db.execute('BEGIN IMMEDIATE')
+            return self.db
+
+        def __exit__(self, exc_type, exc, tb):
+            self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+    def _transaction(self):
+        return self._Transaction(self._db())
+
+    def add(self, url, kind, series_slug, job, priority=EPISODE_PRIORITY):
+        """Añade una URL si no estaba ya en la frontera (en cualquier estado)"""
+        with self._transaction() as db:
+            self._insert(db, url, kind, series_slug, job, priority)
+
+    def _insert(self, db, url, kind, series_slug, job, priority):
+        db.execute(
+            'INSERT OR IGNORE INTO frontier (url, kind, series_slug, job, priority, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (url, kind, series_slug, json.dumps(job, ensure_ascii=False), priority, time.time())
+        )
+
+    def seed(self, series_map):
+        """Añade los índices de todas las series (los ya procesados no se repiten)"""
+        with self._transaction() as db:
+            for series_slug, series_info in series_map.items():
+                self._insert(db, series_info['episodes_url'], 'index', series_slug,
+                             {'series_slug': series_slug}, INDEX_PRIORITY)
+
+    def release_orphans(self):
+        """Devuelve a pending las URLs in_flight de procesos de esta máquina que ya no existen"""
+        hostname = socket.gethostname()
+        released = 0
+        with self._transaction() as db:
+            rows = db.execute("SELECT url, owner FROM frontier WHERE state = 'in_flight'").fetchall()
+            for row in rows:
+                host, _, pid = (row['owner'] or '').rpartition(':')
+                if host == hostname and pid.isdigit() and not _process_alive(int(pid)):
+                    db.execute(
+                        "UPDATE frontier SET state = 'pending', owner = NULL, lease_until = NULL WHERE url = ?",
+                        (row['url'],)
+                    )
+                    released += 1
+        return released
+
+    def lease(self):
+        """Toma la URL disponible de mayor prioridad (pending o con lease caducado).
+        Devuelve un dict con url, kind, series_slug, job y attempts, o None si no hay."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT * FROM frontier "
+                "WHERE state = 'pending' OR (state = 'in_flight' AND lease_until < ?) "
+                "ORDER BY priority, rowid LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE frontier SET state = 'in_flight', attempts = attempts + 1, "
+                "lease_until = ?, owner = ?, updated_at = ? WHERE url = ?",
+                (now + self.lease_seconds, self.owner, now, row['url'])
+            )
+        return {
+            'url': row['url'],
+            'kind': row['kind'],
+            'series_slug': row['series_slug'],
+            'job': json.loads(row['job']),
+            'attempts': row['attempts'] + 1
+        }
+
+    def complete(self, url, new_jobs=()):
+        """Marca la URL como done y añade en la misma transacción los trabajos que generó
+        (new_jobs: lista de (url, kind, series_slug, job, priority))"""
+        with self._transaction() as db:
+            for job in new_jobs:
+                self._insert(db, *job)
+            db.execute(
+                "UPDATE frontier SET state = 'done', owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE url = ?",
+                (time.time(), url)
+            )
+
+    def fail(self, url, error=None):
+        """Registra un fallo: vuelve a pending (al final de la cola) o pasa a failed.
+        Devuelve True si se reintentará"""
+        with self._transaction() as db:
+            row = db.execute('SELECT attempts FROM frontier WHERE url = ?', (url,)).fetchone()
+            retry = row is not None and row['attempts'] < self.max_attempts
+            db.execute(
+                "UPDATE frontier SET state = ?, priority = priority + ?, owner = NULL, "
+                "lease_until = NULL, last_error = ?, updated_at = ? WHERE url = ?",
+                ('pending' if retry else 'failed', RETRY_PRIORITY_STEP if retry else 0,
+                 error, time.time(), url)
+            )
+        return retry
+
+    def counts(self):
+        """Número de URLs por estado"""
+        rows = self._db().execute('SELECT state, COUNT(*) AS n FROM frontier GROUP BY state').fetchall()
+        return {row['state']: row['n'] for row in rows}
+
+    def failed(self):
+        """URLs que agotaron sus intentos, con el último error"""
+        return self._db().execute(
+            "SELECT url, series_slug, attempts, last_error FROM frontier WHERE state = 'failed'"
+        ).fetchall()
+
+    def clear(self):
+        """Vacía la frontera (para empezar de cero, p. ej. con --force)"""
+        with self._transaction() as db:
+            db.execute('DELETE FROM frontier')
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def crawl_frontier(frontier, series_map, list_episodes, process_episode, on_record=None,
+                   retry_queue=None, workers=FRONTIER_WORKERS, max_per_host=MAX_PER_HOST, log=print):
+    """Procesa la frontera hasta vaciarla con `workers` hilos.
+    Cada URL ocupa un hueco de su subdominio (como mucho max_per_host a la vez, igual que en
+    el motor concurrente) y las páginas de galería solo toman prestados los huecos libres.
+    Usa las mismas funciones que el motor concurrente (list_episodes / process_episode).
+    list_episodes debe lanzar una excepción si no puede leer el índice: solo una lista
+    (aunque sea vacía) da el índice por hecho; si falla, se reintenta como cualquier URL.
+    Si process_episode encola el trabajo en retry_queue (fallo transitorio), la URL vuelve
+    a la frontera para reintentarse en lugar de quedarse en la cola en memoria.
+    Devuelve los registros obtenidos en esta ejecución."""
+    frontier.seed(series_map)
+    released = frontier.release_orphans()
+    if released:
+        log(f"♻️  {released} URLs recuperadas de una ejecución interrumpida")
+    log(f"🧭 Frontera: {frontier.counts()}")
+
+    records = []
+    record_lock = threading.Lock()
+    # Hilos procesando una URL: mientras haya alguno, puede que añada trabajo nuevo
+    busy = [0]
+    busy_changed = threading.Condition()
+    host_slots = HostSlots(max_per_host)
+
+    def handle(item):
+        url = item['url']
+        if item['kind'] == 'index':
+            series_slug = item['series_slug']
+            series_info = series_map.get(series_slug)
+            if series_info is None:
+                frontier.fail(url, 'serie desconocida')
+                return
+            jobs = list_episodes(series_slug, series_info)
+            frontier.complete(url, [
+                (job['episode_url'], 'episode', series_slug, job, EPISODE_PRIORITY) for job in jobs
+            ])
+            log(f"🧭 {series_info['name']}: {len(jobs)} episodios añadidos a la frontera")
+            return
+
+        job = item['job']
+        record = process_episode(job)
+        if record is None and retry_queue is not None and retry_queue.remove(job):
+            if frontier.fail(url, 'error transitorio'):
+                log(f"    🔁 {job.get('episode_number')} vuelve a la frontera (intento {item['attempts']})")
+            else:
+                log(f"❌ Sin recuperar tras {item['attempts']} intentos: {job.get('episode_number')} ({url})")
+            return
+        if record:
+            with record_lock:
+                records.append(record)
+                if on_record:
+                    on_record(record)
+        # Solo después de guardar el registro: si el proceso muere antes, la URL se repite
+        frontier.complete(url)
+
+    def worker():
+        while True:
+            with busy_changed:
+                item = frontier.lease()
+                while item is None and busy[0]:
+                    busy_changed.wait(timeout=1)
+                    item = frontier.lease()
+                if item is None:
+                    busy_changed.notify_all()
+                    return
+                busy[0] += 1
+            try:
+                host_slots.call(item['url'], handle, item)
+            except Exception as e:
+                frontier.fail(item['url'], str(e))
+                log(f"❌ Error procesando {item['url']}: {e}")
+            finally:
+                with busy_changed:
+                    busy[0] -= 1
+                    busy_changed.notify_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(worker) for _ in range(workers)]:
+            future.result()
+
+    log(f"🧭 Frontera: {frontier.counts()}")
+    return records
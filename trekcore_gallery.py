@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Utilidades para galerías Coppermine de TrekCore (thumbnails.php?album=N&page=X).
+Descarga en paralelo todas las páginas de un álbum y va entregando las URLs de
+las imágenes según llegan las páginas.
+
+Las páginas de miniaturas se leen en streaming (ThumbnailStreamParser): las URLs se
+extraen de los trozos de bytes según llegan, sin construir árbol. Si el resultado no
+pasa la validación se vuelve al parseo con BeautifulSoup.
+"""
+
+import codecs
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+
+from trekcore_crawler import extra_host_slots
+
+GALLERY_WORKERS = 4     # Páginas de galería descargadas a la vez por álbum (máximo)
+
+STREAM_CHUNK_SIZE = 16 * 1024           # Bytes leídos de cada respuesta por iteración
+FALLBACK_BUFFER_BYTES = 1024 * 1024     # Bytes que se guardan para el respaldo (si no, se re-descarga)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+SKIPPED_LINKS = ('displayimage.php', 'thumbnails.php')
+
+PAGE_INFO_PATTERN = re.compile(r'(\d+) files on (\d+) page')
+
+def gallery_page_url(gallery_url, page_num):
+    """URL de la página page_num de una galería: thumbnails.php?album=193&page=X"""
+    if '?' in gallery_url:
+        return f"{gallery_url}&page={page_num}"
+    return f"{gallery_url}?page={page_num}"
+
+def parse_total_pages(text):
+    """Lee 'N files on M page(s)' del texto de una galería. Devuelve M (1 si no aparece)"""
+    match = PAGE_INFO_PATTERN.search(text)
+    return int(match.group(2)) if match else 1
+
+def iter_gallery_images(gallery_url, pages, fetch_images, max_workers=GALLERY_WORKERS, log=print):
+    """Descarga en paralelo las páginas indicadas y devuelve sus imágenes según van llegando.
+    fetch_images(page_url) debe devolver la lista de URLs de una página.
+    Dentro del motor concurrente las páginas cuentan en el límite por host (MAX_PER_HOST): el
+    trabajo presta su propio hueco y solo añade los que estén libres. Como mucho hay tantas
+    páginas en vuelo como hilos, de modo que no se acumulan resultados sin consumir.
+    Si una página falla, la excepción se propaga (tras las que ya estaban en vuelo): una
+    galería completa a la que le falta una página no debe guardarse como completa."""
+    pages = iter(pages)
+    with extra_host_slots(gallery_url, max_workers - 1) as extra:
+        workers = 1 + extra
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            in_flight = {}
+
+            def submit_next():
+                page_num = next(pages, None)
+                if page_num is not None:
+                    future = pool.submit(fetch_images, gallery_page_url(gallery_url, page_num))
+                    in_flight[future] = page_num
+
+            for _ in range(workers):
+                submit_next()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page_num = in_flight.pop(future)
+                    submit_next()
+                    try:
+                        images = future.result()
+                    except Exception as e:
+                        log(f"    ⚠️ Error en página {page_num}: {e}")
+                        for pending in in_flight:
+                            pending.cancel()
+                        raise
+                    yield from images
+
+class ThumbnailStreamParser(HTMLParser):
+    """Extrae las URLs a resolución completa (<a href="...jpg"><img></a>) de una página de
+    miniaturas a partir de trozos de bytes, con memoria constante"""
+
+    def __init__(self, page_url):
+        super().__init__()
+        self.base_dir = page_url.rsplit('/', 1)[0]
+        self.images = []
+        self.total_pages = 1
+        self.thumbnails = 0         # <img class="... thumbnail"> vistas (para validar)
+        self._href = None
+        # Las páginas Coppermine de TrekCore son UTF-8 (a veces con BOM); las URLs son ASCII
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        self._text_tail = ''
+
+    def feed_bytes(self, chunk):
+        self.feed(self._decoder.decode(chunk))
+
+    def close(self):
+        self.feed(self._decoder.decode(b'', final=True))
+        super().close()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self._href = dict(attrs).get('href')
+        elif tag == 'img':
+            if 'thumbnail' in (dict(attrs).get('class') or '').split():
+                self.thumbnails += 1
+            if self._href:
+                self._add_image(self._href)
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._href = None
+
+    def handle_data(self, data):
+        # "738 files on 31 page(s)" puede llegar partido entre dos trozos
+        text = self._text_tail + data
+        match = PAGE_INFO_PATTERN.search(text)
+        if match:
+            self.total_pages = int(match.group(2))
+        self._text_tail = text[-64:]
+
+    def _add_image(self, href):
+        if not href.lower().endswith(IMAGE_EXTENSIONS):
+            return
+        if any(skipped in href for skipped in SKIPPED_LINKS):
+            return
+        if not href.startswith('http'):
+            href = f"{self.base_dir}/{href}"
+        self.images.append(href)
+
+    def valid(self):
+        """Resultado fiable: hay imágenes y ninguna miniatura Coppermine quedó sin URL"""
+        return bool(self.images) and len(self.images) >= self.thumbnails
+
+def iter_response_chunks(response, chunk_size=STREAM_CHUNK_SIZE):
+    """Trozos del cuerpo de una respuesta: del socket si es stream=True y aún no se ha
+    leído, o del contenido ya descargado (caché, reproducción offline...)"""
+    try:
+        if response._content is False and response.raw is not None:
+            yield from response.iter_content(chunk_size)
+        else:
+            content = response.content
+            for start in range(0, len(content), chunk_size):
+                yield content[start:start + chunk_size]
+    finally:
+        # Devuelve la conexión al pool aunque la lectura se corte a medias
+        response.close()
+
+def stream_gallery_page(chunks, page_url, fallback, refetch=None, log=None):
+    """Lee una página de miniaturas a partir de sus trozos de bytes (iter_response_chunks).
+    Devuelve (imágenes, total_páginas). Si la extracción no pasa la validación se usa
+    fallback(contenido) (BeautifulSoup); si la lectura falló o la página superaba
+    FALLBACK_BUFFER_BYTES, el contenido se obtiene con refetch()."""
+    parser = ThumbnailStreamParser(page_url)
+    buffered = []
+    size = 0
+    error = None
+    try:
+        for chunk in chunks:
+            parser.feed_bytes(chunk)
+            size += len(chunk)
+            if buffered is not None:
+                buffered.append(chunk)
+                if size > FALLBACK_BUFFER_BYTES:
+                    buffered = None
+        parser.close()
+    except Exception as e:
+        error = e
+
+    if error is None and parser.valid():
+        return parser.images, parser.total_pages
+
+    if log:
+        reason = error or f"{len(parser.images)} imágenes para {parser.thumbnails} miniaturas"
+        log(f"    ↩️  Extracción en streaming no válida ({reason}): usando BeautifulSoup")
+    if buffered is not None and error is None:
+        return fallback(b''.join(buffered))
+    if refetch is None:
+        raise error or ValueError(f"Página demasiado grande para el respaldo: {page_url}")
+    return fallback(refetch())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Cliente HTTP compartido por todos los scripts.
+Mantiene una Session de requests por host (keep-alive + pool de conexiones),
+cachea resoluciones DNS y reutiliza un único contexto TLS.
+"""
+
+import atexit
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from trekcore_cache import HttpCache
+from trekcore_ratelimit import AdaptiveRateLimiter
+from trekcore_replay import ResponseRecorder, ResponseReplayer
+from trekcore_retry import RETRY_EXCEPTIONS, RETRY_STATUS, CircuitBreakers, RetryPolicy
+
+# Configuración del pool (ajustable con configure())
+POOL_CONNECTIONS = 10   # Pools de conexiones que guarda cada Session
+POOL_MAXSIZE = 10       # Conexiones abiertas por host (>= concurrencia por subdominio)
+DNS_CACHE_TTL = 300     # Segundos que se reutiliza una resolución DNS (0 = desactivado)
+DEFAULT_TIMEOUT = 30
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_original_getaddrinfo = socket.getaddrinfo
+
+# Ritmo de peticiones por host (sustituye a los time.sleep fijos)
+rate_limiter = AdaptiveRateLimiter()
+
+# Reintentos con backoff y circuit breaker por host
+retry_policy = RetryPolicy()
+circuit_breakers = CircuitBreakers()
+
+# Caché de peticiones condicionales (solo para las llamadas con cache=True)
+http_cache = HttpCache()
+
+# Modo grabación / reproducción offline (--record / --replay)
+_recorder = None
+_replayer = None
+
+# Función de log del script (set_logger)
+_log_func = None
+
+# Un solo contexto TLS para todas las conexiones: los certificados CA se cargan una vez
+_ssl_context = ssl.create_default_context(cafile=requests.certs.where())
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter que comparte el contexto TLS entre todas las conexiones"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = _ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['ssl_context'] = _ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        # Con verify=True los CA ya están en _ssl_context: evitar recargarlos en cada conexión
+        if verify is True:
+            conn.ca_certs = None
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    """getaddrinfo con caché en memoria (TTL = DNS_CACHE_TTL)"""
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+    result = _original_getaddrinfo(host, port, *args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+def _install_dns_cache():
+    if DNS_CACHE_TTL > 0:
+        socket.getaddrinfo = _cached_getaddrinfo
+    else:
+        socket.getaddrinfo = _original_getaddrinfo
+
+def configure(pool_connections=None, pool_maxsize=None, dns_cache_ttl=None):
+    """Ajusta el pool y la caché DNS. Las sesiones ya creadas se cierran y se recrean"""
+    global POOL_CONNECTIONS, POOL_MAXSIZE, DNS_CACHE_TTL
+    if pool_connections is not None:
+        POOL_CONNECTIONS = pool_connections
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+    if dns_cache_ttl is not None:
+        DNS_CACHE_TTL = dns_cache_ttl
+        with _dns_lock:
+            _dns_cache.clear()
+    close_sessions()
+
+def set_logger(log):
+    """Usa la función log del script para los avisos de la capa HTTP"""
+    global _log_func
+    _log_func = log
+    rate_limiter.log = log
+    circuit_breakers.log = log
+
+def enable_record(path):
+    """Graba todas las respuestas en el archivo ZIP `path`"""
+    global _recorder
+    _recorder = ResponseRecorder(path)
+    atexit.register(_recorder.close)
+
+def enable_replay(path):
+    """Sirve todas las peticiones desde el archivo ZIP `path`, sin red"""
+    global _replayer
+    _replayer = ResponseReplayer(path)
+
+def configure_from_argv(argv):
+    """Activa --record ARCHIVO / --replay ARCHIVO si vienen en la línea de comandos"""
+    for flag, enable in (('--record', enable_record), ('--replay', enable_replay)):
+        if flag in argv:
+            index = argv.index(flag)
+            if index + 1 < len(argv):
+                enable(argv[index + 1])
+
+def get_session(url):
+    """Devuelve la Session (con pool keep-alive) del host de la URL"""
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            _install_dns_cache()
+            session = requests.Session()
+            adapter = PooledAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+    return session
+
+def http_get(url, headers=None, timeout=DEFAULT_TIMEOUT, cache=False, **kwargs):
+    """GET usando la Session compartida del host (misma firma que requests.get).
+    Con cache=True se hace una petición condicional contra http_cache: si el servidor
+    responde 304 se devuelve la respuesta guardada con response.from_cache = True."""
+    if _replayer:
+        response = _replayer.get(url)
+        response.from_cache = False
+        response.replayed = True    # No se mezcla con la caché en disco (cached_parse)
+        response.cache_url = url
+        return response
+    
+    if cache:
+        headers = dict(headers or {})
+        headers.update(http_cache.conditional_headers(url))
+    
+    response = None
+    for attempt in range(retry_policy.max_attempts):
+        circuit_breakers.wait(url)
+        rate_limiter.acquire(url)
+        start = time.monotonic()
+        try:
+            response = get_session(url).get(url, headers=headers, timeout=timeout, **kwargs)
+        except RETRY_EXCEPTIONS as e:
+            rate_limiter.observe(url, error=True)
+            circuit_breakers.record(url, success=False)
+            response, last_error = None, e
+        else:
+            rate_limiter.observe(url, response, latency=time.monotonic() - start)
+            retryable = response.status_code in RETRY_STATUS
+            circuit_breakers.record(url, success=not retryable)
+            if not retryable:
+                break
+        
+        if attempt + 1 < retry_policy.max_attempts:
+            delay = retry_policy.delay(attempt)
+            if response is not None:
+                reason = f"HTTP {response.status_code}"
+                response.close()
+            else:
+                reason = type(last_error).__name__
+            _log(f"    🔁 {reason} en {url}: reintento {attempt + 2}/{retry_policy.max_attempts} en {delay:.1f}s")
+            time.sleep(delay)
+    
+    # Agotados los intentos: error de red -> excepción; estado HTTP -> última respuesta
+    if response is None:
+        raise last_error
+    
+    if cache:
+        response = http_cache.resolve(url, response)
+    # Las descargas en streaming (imágenes) no se graban, salvo las páginas HTML
+    if _recorder and (not kwargs.get('stream') or 'html' in response.headers.get('Content-Type', '')):
+        _recorder.record_response(url, response)
+    return response
+
+def _log(message):
+    if _log_func:
+        _log_func(message)
+
+def close_sessions():
+    """Cierra todas las sesiones abiertas"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Diario append-only (JSONL) de registros de screencaps.
+
+Guardar un episodio ya no reescribe __screencaps.json entero: se añade una línea al
+diario. La compactación (compact) fusiona el diario con __screencaps.json en streaming
+(registro a registro; en memoria solo queda un mapa clave -> id por episodio), lo escribe
+con el mismo formato de siempre ({'screencaps': [...], 'last_updated', 'total_episodes'})
+y vacía el diario.
+Si una ejecución se interrumpe, el diario se compacta al arrancar la siguiente. Varios
+procesos pueden compartir diario y snapshot: append y compact van bajo el mismo bloqueo.
+"""
+
+import os
+import threading
+from datetime import datetime
+
+from trekcore_jsonstream import dumps, iter_array, loads, write_array_atomic
+from trekcore_lock import file_lock
+
+JOURNAL_FSYNC = True    # fsync tras cada línea (el diario sobrevive a un corte de luz)
+NEXT_ID_SUFFIX = '.next_id'     # Contador de ids reservados junto a __screencaps.json
+
+def record_key(record):
+    return f"{record['series_slug']}_{record['episode_number']}"
+
+def iter_screencaps(path, meta=None):
+    """Registros de __screencaps.json leídos en streaming, cada uno con su id (en un fichero
+    sin ids, su posición). Si el fichero no existe no devuelve nada. Las demás claves
+    (last_updated...) se guardan en meta si se pasa un dict"""
+    next_id = 0
+    try:
+        for record in iter_array(path, 'screencaps', meta=meta):
+            if 'id' not in record:
+                record['id'] = next_id
+            next_id = max(next_id, record['id'] + 1)
+            yield record
+    except FileNotFoundError:
+        return
+
+def reserved_next_id(path):
+    """Primer id que nadie ha reservado en el contador de path (0 si no existe). Quien da
+    ids nuevos a __screencaps.json (el diario o la base de datos) parte de este contador y
+    lo avanza bajo file_lock(path): dos procesos nunca dan el mismo id a episodios distintos"""
+    try:
+        with open(f"{path}{NEXT_ID_SUFFIX}", encoding='utf-8') as f:
+            return int(loads(f.read()))
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def reserve_next_id(path, next_id):
+    """Avanza el contador de ids de path hasta next_id (llamar bajo file_lock(path))"""
+    if next_id > reserved_next_id(path):
+        write_json_atomic(f"{path}{NEXT_ID_SUFFIX}", next_id)
+
+def rewrite_screencaps(path, records):
+    """Fusiona registros en __screencaps.json en streaming conservando el orden y el id
+    estable de cada episodio: uno ya presente se sustituye en su sitio y conserva su id, y
+    uno nuevo se añade al final con el siguiente id libre (ni en el fichero ni reservado).
+    Llamar bajo file_lock(path). Escritura atómica. Los registros no se cargan en memoria,
+    pero el mapa clave -> id crece con el número de episodios (unos 2 / 6 / 18 MB con
+    1k / 10k / 100k). Devuelve (episodios, {series_slug_episode_number: id})"""
+    updates = {}
+    for record in records:
+        updates[record_key(record)] = record
+    ids = {}
+    next_id = reserved_next_id(path)
+
+    def merged():
+        nonlocal next_id
+        for existing in iter_screencaps(path):
+            key = record_key(existing)
+            if key in ids:
+                continue    # Clave repetida en el fichero: manda la primera
+            update = updates.pop(key, None)
+            if update is not None:
+                existing = dict(update, id=existing['id'])
+            ids[key] = existing['id']
+            next_id = max(next_id, existing['id'] + 1)
+            yield existing
+        for key, record in updates.items():
+            if 'id' not in record:
+                record = dict(record, id=next_id)
+            ids[key] = record['id']
+            next_id = max(next_id, record['id'] + 1)
+            yield record
+
+    total = write_array_atomic(path, 'screencaps', merged(), lambda count: {
+        'last_updated': datetime.now().isoformat(),
+        'total_episodes': count
+    })
+    reserve_next_id(path, next_id)
+    return total, ids
+
+def write_json_atomic(path, data):
+    """Escribe en un temporal, fsync y lo renombra: el JSON nunca queda a medias"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Temporal propio de cada proceso e hilo: dos escrituras a la vez no comparten fichero
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(dumps(data, indent=2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class ScreencapsJournal:
+    """Diario de registros pendientes de fusionar en __screencaps.json"""
+
+    def __init__(self, journal_path, snapshot_path, log=None):
+        self.journal_path = journal_path
+        self.snapshot_path = snapshot_path
+        self.log = log
+        self._lock = threading.RLock()
+
+    def _read_journal(self):
+        """Registros del diario (una línea cortada por una interrupción se ignora)"""
+        records = []
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(loads(line))
+                    except ValueError:
+                        self._log(f"⚠️ Línea incompleta en el diario {self.journal_path}: ignorada")
+        except FileNotFoundError:
+            pass
+        return records
+
+    def records(self):
+        """Registros del diario pendientes de compactar"""
+        with self._lock:
+            return self._read_journal()
+
+    def pending(self):
+        """Número de registros en el diario pendientes de compactar"""
+        return len(self.records())
+
+    def append(self, records):
+        """Añade registros al diario"""
+        # Mismo bloqueo que compact: ninguna línea se añade mientras otro proceso compacta
+        with self._lock, file_lock(self.snapshot_path):
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            torn = self._ends_torn()
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                if torn:
+                    f.write('\n')   # No pegar el registro nuevo a una línea cortada
+                for record in records:
+                    f.write(dumps(record) + '\n')
+                f.flush()
+                if JOURNAL_FSYNC:
+                    os.fsync(f.fileno())
+
+    def _ends_torn(self):
+        """True si el diario termina sin salto de línea (escritura interrumpida)"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return False
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b'\n'
+        except FileNotFoundError:
+            return False
+
+    def compact(self):
+        """Fusiona el diario con __screencaps.json (bloqueo + streaming, así que también
+        conserva lo que otro proceso haya escrito en el fichero) y vacía el diario.
+        Devuelve (episodios del fichero resultante, {(series_slug, episode_number): id} de los
+        episodios compactados)"""
+        with self._lock, file_lock(self.snapshot_path):
+            journal = self._read_journal()
+            total, ids = rewrite_screencaps(self.snapshot_path, journal)
+            # Si el proceso muere aquí, volver a aplicar el diario no cambia nada (misma clave)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            return total, {
+                (record['series_slug'], record['episode_number']): ids[record_key(record)]
+                for record in journal
+            }
+
+    def _log(self, message):
+        if self.log:
+            self.log(message)
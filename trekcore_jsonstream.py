@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Lectura y escritura de JSON en streaming para __screencaps.json.
+
+Con las galerías completas __screencaps.json ocupa cientos de MB, así que no se carga
+entero: iter_array() lee el fichero por bloques (CHUNK_SIZE) y devuelve uno a uno los
+elementos de la lista de una clave ({"screencaps": [...], ...}), y write_array_atomic()
+escribe el documento registro a registro, con el mismo formato que json.dump(indent=2,
+ensure_ascii=False). La memoria usada es la de un bloque más un registro, sea cual sea el
+tamaño del fichero.
+
+Si está instalado orjson se usa para serializar y para los documentos pequeños
+(loads / dumps); si no, el módulo json de la librería estándar. Con los datos de los
+scrapers (cadenas, enteros, listas y dicts) la salida es la misma que con json; con
+floats no: orjson escribe los exponentes sin signo ni ceros (1e20, 1e-7 en lugar de
+1e+20, 1e-07) y NaN / Infinity como null.
+"""
+
+import json
+import os
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CHUNK_SIZE = 1 << 20    # Caracteres leídos por bloque
+INDENT = 2
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+def loads(content):
+    """json.loads (orjson si está disponible)"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def dumps(data, indent=None):
+    """json.dumps(ensure_ascii=False) como str (orjson si está disponible; los floats pueden
+    salir con otro formato, ver arriba)"""
+    if orjson is not None and indent in (None, INDENT):
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+        except TypeError:
+            pass    # Tipos que orjson no serializa (claves no str...): json estándar
+    if indent is None:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(data, indent=indent, ensure_ascii=False)
+
+def load(path):
+    """Carga un documento JSON completo (para los ficheros pequeños)"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+class _StreamReader:
+    """Lee valores JSON de un fichero por bloques"""
+
+    def __init__(self, f, chunk_size=None):
+        self.f = f
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Siguiente carácter que no es espacio ('' al final del fichero)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_more():
+                return ''
+
+    def expect(self, chars):
+        """Consume el siguiente carácter, que debe ser uno de chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSON inválido en {self.f.name}: se esperaba {chars!r} y hay {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decodifica el siguiente valor completo (leyendo más bloques si está cortado)"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # Un número al final del bloque puede seguir en el siguiente
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read_more()
+
+def iter_array(path, key, chunk_size=None, meta=None):
+    """Itera los elementos de la lista path[key] sin cargar el documento entero.
+    El resto de claves del objeto raíz se guardan en meta (si se pasa un dict) o se descartan"""
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _StreamReader(f, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            name = reader.value()
+            reader.expect(':')
+            if name == key and reader.peek() == '[':
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        yield reader.value()
+                        if reader.expect(',]') == ']':
+                            break
+            else:
+                value = reader.value()
+                if meta is not None:
+                    meta[name] = value
+            if reader.expect(',}') == '}':
+                return
+
+def _indented(data, level):
+    """dumps(indent=2) de data como elemento anidado a level niveles"""
+    return dumps(data, INDENT).replace('\n', '\n' + ' ' * (INDENT * level))
+
+def write_array_atomic(path, key, items, trailer=None):
+    """Escribe {key: [items...], **trailer(n)} registro a registro en un temporal, fsync y lo
+    renombra. trailer(n) recibe el número de elementos y devuelve las claves que van detrás
+    de la lista. Devuelve el número de elementos"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Temporal propio de cada proceso e hilo: dos escrituras a la vez no comparten fichero
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pad = ' ' * INDENT
+    count = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('{\n' + pad + dumps(key) + ': [')
+            for item in items:
+                f.write((',\n' if count else '\n') + pad * 2 + _indented(item, 2))
+                count += 1
+            f.write(('\n' + pad + ']') if count else ']')
+            for name, value in (trailer(count) if trailer else {}).items():
+                f.write(',\n' + pad + dumps(name) + ': ' + _indented(value, 1))
+            f.write('\n}')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
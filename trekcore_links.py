@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Clasificador de enlaces de una página en una sola pasada.
+Recorre cada <a href> una vez con patrones precompilados y devuelve a la vez los
+candidatos a galería (ordenados por prioridad) y los enlaces a episodios.
+"""
+
+import re
+
+GALLERY_HREF_PATTERN = re.compile(r'gallery/thumbnails\.php')
+
+# Enlaces a episodios en los índices legacy: season1/1x01/, season1/1x01.html, season1/101.html
+EPISODE_SX_PATTERN = re.compile(r'\d+x\d+')
+EPISODE_SEASON_PATTERN = re.compile(r'season', re.IGNORECASE)
+EPISODE_HTML_PATTERN = re.compile(r'season\d+/\d{3}\.html')
+
+# Prioridad de los candidatos a galería (menor = mejor)
+RANK_GALLERY_KEYWORD = 0    # thumbnails.php con texto preferido ("HD Screencaps")
+RANK_GALLERY = 1            # cualquier thumbnails.php
+RANK_TEXT = 2               # enlace sin thumbnails.php pero con texto de galería ("Promotional Photos")
+
+def is_episode_href(href):
+    """True si el href parece la página de un episodio en un índice legacy"""
+    if EPISODE_SEASON_PATTERN.search(href) and EPISODE_SX_PATTERN.search(href):
+        return True
+    return bool(EPISODE_HTML_PATTERN.search(href))
+
+def classify_links(soup, gallery_keywords=(), text_keywords=()):
+    """Clasifica todos los enlaces de una página parseada.
+    gallery_keywords: textos que hacen preferible un enlace a thumbnails.php.
+    text_keywords: textos que convierten en candidato un enlace sin thumbnails.php.
+    Devuelve {'gallery': [{'href', 'text', 'rank'}] ordenados por prioridad (y orden en la
+    página), 'episodes': [anchors] sin duplicados (ignorando la barra final)}."""
+    gallery = []
+    episodes = []
+    seen_episodes = set()
+
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        text = link.get_text()
+        lowered = text.lower()
+
+        if GALLERY_HREF_PATTERN.search(href):
+            preferred = any(keyword in lowered for keyword in gallery_keywords)
+            gallery.append({
+                'href': href,
+                'text': text.strip(),
+                'rank': RANK_GALLERY_KEYWORD if preferred else RANK_GALLERY
+            })
+        elif text_keywords and any(keyword in lowered for keyword in text_keywords):
+            gallery.append({'href': href, 'text': text.strip(), 'rank': RANK_TEXT})
+
+        if is_episode_href(href):
+            normalized = href.rstrip('/')
+            if normalized not in seen_episodes:
+                seen_episodes.add(normalized)
+                episodes.append(link)
+
+    # sort es estable: a igual prioridad se respeta el orden de la página
+    gallery.sort(key=lambda candidate: candidate['rank'])
+    return {'gallery': gallery, 'episodes': episodes}
+
+def best_gallery_link(links):
+    """Mejor candidato a galería de classify_links() (o None)"""
+    return links['gallery'][0] if links['gallery'] else None
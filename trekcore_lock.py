@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Bloqueos entre procesos para los JSON que comparten los scrapers.
+
+file_lock(path) es un bloqueo advisory exclusivo (fcntl.flock sobre FICHERO.lock),
+reentrante en el mismo hilo, y file_version(path) identifica el contenido actual de un
+fichero. Este módulo no fusiona nada: la relectura y fusión bajo el bloqueo la hace cada
+escritor (ScreencapsJournal.compact, EpisodeMetadata.link_gallery,
+ScreencapsStore.export_screencaps). Sin fcntl (Windows) el bloqueo solo coordina hilos del
+mismo proceso.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_SUFFIX = '.lock'
+
+_local = threading.local()
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+def _process_lock(lock_path):
+    with _process_locks_guard:
+        return _process_locks.setdefault(lock_path, threading.Lock())
+
+@contextmanager
+def file_lock(path):
+    """Bloqueo exclusivo sobre path mientras dura el bloque (reentrante en el mismo hilo)"""
+    lock_path = f"{path}{LOCK_SUFFIX}"
+    held = getattr(_local, 'held', None)
+    if held is None:
+        held = _local.held = {}
+    if held.get(lock_path):
+        held[lock_path] += 1
+        try:
+            yield
+        finally:
+            held[lock_path] -= 1
+        return
+
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _process_lock(lock_path):
+        with open(lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            held[lock_path] = 1
+            try:
+                yield
+            finally:
+                held[lock_path] = 0
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def file_version(path):
+    """Identifica el contenido actual de un fichero (mtime, tamaño, inodo) o None si no existe"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Capa de parseo HTML compartida por los scrapers.
+Usa lxml por defecto (mucho más rápido que html.parser) y un SoupStrainer por tipo de
+página, de modo que solo se construye el árbol de los elementos que se usan:
+
+  - 'series_index': tablas de episodios (table.sortable con td.col1 / td.col2)
+  - 'links':        enlaces <a href> (páginas de episodio, índices legacy, categorías)
+  - 'gallery':      enlaces <a> (con sus <img>) y la celda "N files on M page(s)"
+"""
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401  (solo para saber si el backend está disponible)
+    DEFAULT_BACKEND = 'lxml'
+except ImportError:
+    DEFAULT_BACKEND = 'html.parser'
+
+# Backend de BeautifulSoup: 'lxml', 'html.parser' o 'html5lib' (ajustable con set_backend())
+PARSER_BACKEND = DEFAULT_BACKEND
+
+def _gallery_tag(name, attrs):
+    """Enlaces e imágenes de la galería y celda de cabecera con el total de páginas"""
+    if name == 'a':
+        return True
+    if name == 'td':
+        classes = attrs.get('class') or ''
+        if not isinstance(classes, str):
+            classes = ' '.join(classes)
+        return 'tableh1' in classes.split()
+    return False
+
+STRAINERS = {
+    'series_index': SoupStrainer('table', class_='sortable'),
+    'links': SoupStrainer('a', href=True),
+    'gallery': SoupStrainer(_gallery_tag),
+}
+
+def set_backend(backend):
+    """Cambia el backend de parseo para todas las páginas"""
+    global PARSER_BACKEND
+    PARSER_BACKEND = backend
+
+def parse_html(content, page_type=None, backend=None):
+    """Parsea una página. Con page_type solo se construyen los elementos de ese tipo de
+    página (ver STRAINERS); sin él se parsea el documento completo."""
+    backend = backend or PARSER_BACKEND
+    # html5lib no admite parse_only: construye siempre el árbol completo
+    strainer = STRAINERS[page_type] if page_type and backend != 'html5lib' else None
+    return BeautifulSoup(content, backend, parse_only=strainer)
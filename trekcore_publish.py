@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Publicación compacta de __screencaps.json para el hosting estático del blog.
+
+Genera __screencaps.min.json: JSON minificado en el que las URLs se guardan como
+diccionario de prefijos (el directorio del álbum, que se repite en todas las imágenes de
+un episodio) + nombre de fichero, agrupadas por prefijo:
+
+    {"format": "trekcore-screencaps/1",
+     "prefixes": ["https://discovery.trekcore.com/gallery/albums/promo-photos/season1/101-102/", ...],
+     "screencaps": [{"series_slug": ..., "episode_number": ..., ...,
+                     "images": [[0, ["dsc101-001.jpg", "dsc101-002.jpg"]], ...]}],
+     "last_updated": ..., "total_episodes": ...}
+
+Junto a él se escriben las copias precomprimidas .gz y, si está instalado brotli, .br.
+decode_screencaps() devuelve el formato original (con las URLs completas).
+
+shard_screencaps() reparte el mismo formato en ficheros por serie (y, opcionalmente, por
+episodio) dentro de __screencaps/, con un manifest.json que indica para cada fichero su
+hash de contenido, de modo que el blog solo descarga lo que muestra y el CDN puede
+cachearlos indefinidamente (FICHERO?v=HASH). El last_updated de cada fichero es el
+scraped_at más reciente de sus episodios (el global solo va en el manifest), así que el
+hash de una serie solo cambia si cambian sus episodios:
+
+    __screencaps/manifest.json
+    __screencaps/tng.json
+    __screencaps/tng/101.json      (con --episodes)
+
+    python3 trekcore_publish.py [__screencaps.json] [__screencaps.min.json]
+    python3 trekcore_publish.py --shards [--episodes] [__screencaps.json] [directorio]
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+
+from trekcore_records import MISSING, ScreencapsIndex
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Configuración
+SCREENCAPS_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.json'
+
+FORMAT = 'trekcore-screencaps/1'
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+HASH_LENGTH = 16        # Caracteres hex de sha256 en el manifest
+MANIFEST_NAME = 'manifest.json'
+
+_UNSAFE_NAME = re.compile(r'[^A-Za-z0-9._-]+')
+
+def publish_path(screencaps_path):
+    """__screencaps.json -> __screencaps.min.json"""
+    root, ext = os.path.splitext(screencaps_path)
+    return f"{root}.min{ext or '.json'}"
+
+def shards_dir(screencaps_path):
+    """__screencaps.json -> __screencaps/"""
+    return os.path.splitext(screencaps_path)[0]
+
+def encode_records(records, prefixes, last_updated=None):
+    """ScreencapRecord (de un ScreencapsIndex) -> formato compacto, con una tabla de prefijos
+    propia que solo incluye los que usan estos registros"""
+    local_ids = {}
+    local_prefixes = []
+    screencaps = []
+    for record in records:
+        encoded = record.to_dict(prefixes, urls=False)
+        images = []
+        for prefix_id, names in record.images:
+            local_id = local_ids.get(prefix_id)
+            if local_id is None:
+                local_id = local_ids[prefix_id] = len(local_prefixes)
+                local_prefixes.append(prefixes.prefixes[prefix_id])
+            images.append([local_id, list(names)])
+        encoded['images'] = images
+        screencaps.append(encoded)
+    return {
+        'format': FORMAT,
+        'prefixes': local_prefixes,
+        'screencaps': screencaps,
+        'last_updated': last_updated,
+        'total_episodes': len(screencaps)
+    }
+
+def decode_screencaps(encoded):
+    """Formato compacto -> formato de __screencaps.json (URLs completas)"""
+    if encoded.get('format') != FORMAT:
+        raise ValueError(f"Formato desconocido: {encoded.get('format')}")
+    prefixes = encoded['prefixes']
+    screencaps = []
+    for record in encoded['screencaps']:
+        decoded = {key: value for key, value in record.items() if key != 'images'}
+        decoded['screencaps'] = [
+            prefixes[prefix_id] + name
+            for prefix_id, names in record['images']
+            for name in names
+        ]
+        screencaps.append(decoded)
+    return {
+        'screencaps': screencaps,
+        'last_updated': encoded.get('last_updated'),
+        'total_episodes': encoded.get('total_episodes', len(screencaps))
+    }
+
+def _write_bytes_atomic(path, content):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Temporal propio de cada proceso e hilo: dos publicaciones a la vez no comparten fichero
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+def _write_published(path, content, force=True):
+    """Escribe path y sus copias .gz / .br. Con force=False no toca un fichero cuyo
+    contenido no cambió (mismo mtime / ETag en el CDN). Devuelve True si se escribió"""
+    if not force:
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == content and os.path.exists(f"{path}.gz"):
+                    return False
+        except FileNotFoundError:
+            pass
+    _write_bytes_atomic(path, content)
+    # mtime=0: el .gz solo cambia si cambia el contenido (ETag estable en el CDN)
+    _write_bytes_atomic(f"{path}.gz", gzip.compress(content, GZIP_LEVEL, mtime=0))
+    if brotli is not None:
+        _write_bytes_atomic(f"{path}.br", brotli.compress(content, quality=BROTLI_QUALITY))
+    elif os.path.exists(f"{path}.br"):
+        os.remove(f"{path}.br")  # No dejar una copia .br desactualizada
+    return True
+
+def _remove_published(path):
+    for stale in (path, f"{path}.gz", f"{path}.br"):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+def publish_screencaps(screencaps_path, output_path=None, log=print):
+    """Escribe la versión compacta de __screencaps.json y sus copias .gz / .br.
+    Devuelve {ruta: bytes} de los ficheros generados (y del original)"""
+    output_path = output_path or publish_path(screencaps_path)
+    index = ScreencapsIndex.load(screencaps_path)
+    _write_published(output_path, _dumps(encode_records(index, index.prefixes, index.last_updated)))
+
+    sizes = {screencaps_path: os.path.getsize(screencaps_path)}
+    for path in (output_path, f"{output_path}.gz", f"{output_path}.br"):
+        if os.path.exists(path):
+            sizes[path] = os.path.getsize(path)
+    original = sizes[screencaps_path] or 1
+    log(f"📦 Publicado {output_path}: " + ', '.join(
+        f"{os.path.basename(path)} {size / 1024:.1f} KB ({size * 100 / original:.0f}%)"
+        for path, size in sizes.items()
+    ))
+    return sizes
+
+def shard_screencaps(screencaps_path, output_dir=None, per_episode=False, log=print):
+    """Escribe un fichero compacto por serie (y por episodio si per_episode) y el manifest.
+    Solo se reescriben los ficheros cuyo contenido cambió; los que ya no corresponden a
+    ningún episodio se borran. Devuelve el manifest"""
+    output_dir = output_dir or shards_dir(screencaps_path)
+    index = ScreencapsIndex.load(screencaps_path)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous_files = set(_manifest_files(json.load(f)))
+    except (FileNotFoundError, ValueError):
+        previous_files = set()
+
+    series = {}
+    written = 0
+    series_names = {MANIFEST_NAME[:-len('.json')]}
+    for series_slug, records in index.series().items():
+        # Fecha de la serie, no la global: el hash solo cambia si cambian sus episodios
+        content = _dumps(encode_records(records, index.prefixes, _series_updated(records)))
+        series_name = _file_name(series_slug, series_names)
+        entry = {
+            'file': f"{series_name}.json",
+            'hash': content_hash(content),
+            'episodes': len(records),
+            'screencaps': sum(record.image_count for record in records)
+        }
+        written += _write_published(os.path.join(output_dir, entry['file']), content, force=False)
+
+        if per_episode:
+            episodes = {}
+            episode_names = set()
+            for record in records:
+                scraped_at = record.scraped_at if record.scraped_at is not MISSING else None
+                episode_content = _dumps(encode_records([record], index.prefixes, scraped_at))
+                episode_file = f"{series_name}/{_file_name(record.episode_number, episode_names)}.json"
+                episodes[str(record.episode_number)] = {
+                    'file': episode_file,
+                    'hash': content_hash(episode_content)
+                }
+                written += _write_published(os.path.join(output_dir, episode_file), episode_content, force=False)
+            entry['episode_files'] = episodes
+        series[series_slug] = entry
+
+    manifest = {
+        'format': FORMAT,
+        'last_updated': index.last_updated,
+        'total_episodes': sum(entry['episodes'] for entry in series.values()),
+        'series': series
+    }
+    for stale in previous_files - set(_manifest_files(manifest)):
+        _remove_published(os.path.join(output_dir, stale))
+        if os.path.dirname(stale):
+            try:
+                os.rmdir(os.path.join(output_dir, os.path.dirname(stale)))
+            except OSError:
+                pass    # Aún quedan ficheros en el directorio
+    _write_published(manifest_path, _dumps(manifest), force=False)
+    log(f"🧩 {len(series)} series en {output_dir} ({written} ficheros actualizados)")
+    return manifest
+
+def _file_name(value, taken):
+    """Nombre de fichero seguro (sin '/' ni '..') para un slug o número de episodio, distinto
+    de los de taken (que se actualiza)"""
+    name = _UNSAFE_NAME.sub('_', str(value)).strip('.') or '_'
+    unique, suffix = name, 1
+    while unique in taken:
+        suffix += 1
+        unique = f"{name}-{suffix}"
+    taken.add(unique)
+    return unique
+
+def _series_updated(records):
+    """scraped_at más reciente de los registros (None si ninguno lo tiene)"""
+    dates = [record.scraped_at for record in records if isinstance(record.scraped_at, str)]
+    return max(dates) if dates else None
+
+def _manifest_files(manifest):
+    """Ficheros (relativos al directorio) que referencia un manifest"""
+    for entry in manifest.get('series', {}).values():
+        yield entry['file']
+        for episode_entry in entry.get('episode_files', {}).values():
+            yield episode_entry['file']
+
+def load_published(path):
+    """Lee una versión publicada (.min.json, .gz o .br) y devuelve el formato original"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    if path.endswith('.gz'):
+        content = gzip.decompress(content)
+    elif path.endswith('.br'):
+        if brotli is None:
+            raise ImportError("brotli no está instalado")
+        content = brotli.decompress(content)
+    return decode_screencaps(json.loads(content))
+
+def main():
+    """Uso: trekcore_publish.py [--shards [--episodes]] [__screencaps.json] [salida]"""
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    screencaps_path = args[0] if args else SCREENCAPS_JSON_PATH
+    output_path = args[1] if len(args) > 1 else None
+    if '--shards' in sys.argv:
+        shard_screencaps(screencaps_path, output_path, per_episode='--episodes' in sys.argv)
+    else:
+        publish_screencaps(screencaps_path, output_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Limitador de ritmo adaptativo por host (token bucket).
+Sustituye las pausas fijas de los scrapers: cada subdominio arranca a INITIAL_RATE
+peticiones/s, acelera mientras responde rápido y frena ante 429/503, Retry-After,
+errores o latencias altas (AIMD: subida aditiva, bajada multiplicativa).
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Configuración
+INITIAL_RATE = 1.0      # Peticiones/s con las que arranca cada host
+MIN_RATE = 0.1          # Nunca más lento que 1 petición cada 10s
+MAX_RATE = 8.0          # Techo de velocidad por host
+BURST = 2               # Capacidad del bucket (ráfaga permitida)
+RATE_STEP = 0.25        # Subida tras cada respuesta rápida
+BACKOFF_FACTOR = 0.5    # Bajada ante 429/503 o error de red
+SLOW_FACTOR = 0.8       # Bajada ante respuesta lenta
+FAST_LATENCY = 1.0      # Latencia (s) por debajo de la cual se acelera
+SLOW_LATENCY = 5.0      # Latencia (s) por encima de la cual se frena
+DEFAULT_RETRY_AFTER = 30  # Pausa (s) ante 429/503 sin cabecera Retry-After
+THROTTLE_STATUS = (429, 503)
+
+def parse_retry_after(value):
+    """Convierte una cabecera Retry-After (segundos o fecha HTTP) a segundos"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """Token bucket thread-safe con ritmo variable"""
+
+    def __init__(self, rate=None, capacity=None):
+        self.rate = INITIAL_RATE if rate is None else rate
+        self.capacity = BURST if capacity is None else capacity
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def reserve(self):
+        """Reserva un token y devuelve los segundos a esperar antes de usarlo"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            return max(wait, self.blocked_until - now)
+
+    def block(self, seconds):
+        """Bloquea el host durante `seconds` (Retry-After)"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = min(MAX_RATE, max(MIN_RATE, rate))
+            return self.rate
+
+class AdaptiveRateLimiter:
+    """Un TokenBucket por host que ajusta su ritmo según las respuestas observadas"""
+
+    def __init__(self, log=None):
+        self.log = log
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket()
+            return self._buckets[host]
+
+    def acquire(self, url):
+        """Espera hasta que el host de la URL admita otra petición"""
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def observe(self, url, response=None, latency=None, error=False):
+        """Ajusta el ritmo del host con el resultado de una petición"""
+        bucket = self.bucket(url)
+        host = urlparse(url).netloc
+
+        if error or (response is not None and response.status_code in THROTTLE_STATUS):
+            rate = bucket.set_rate(bucket.rate * BACKOFF_FACTOR)
+            if response is not None and response.status_code in THROTTLE_STATUS:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                pause = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+                bucket.block(pause)
+                self._log(f"    🐢 {host} respondió {response.status_code}: pausa {pause:.0f}s, ritmo {rate:.2f} req/s")
+            else:
+                self._log(f"    🐢 Error de red en {host}: ritmo {rate:.2f} req/s")
+            return
+
+        if latency is None:
+            return
+        if latency > SLOW_LATENCY:
+            rate = bucket.set_rate(bucket.rate * SLOW_FACTOR)
+            self._log(f"    🐢 {host} lento ({latency:.1f}s): ritmo {rate:.2f} req/s")
+        elif latency < FAST_LATENCY:
+            bucket.set_rate(bucket.rate + RATE_STEP)
+
+    def _log(self, message):
+        if self.log:
+            self.log(message)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Modelo compacto en memoria de los registros de screencaps.
+
+En __screencaps.json cada registro es un dict con las URLs completas. Para tener en
+memoria el índice de todas las series al publicar (versión compacta y shards de
+trekcore_publish.py) se usa ScreencapRecord, una dataclass con __slots__ en la que las
+cadenas repetidas (series_slug, episode_number, source) están internadas y cada imagen se
+guarda como (id de prefijo, nombre de fichero): el directorio del álbum se guarda una sola
+vez en UrlPrefixes. Las imágenes van en grupos consecutivos con el mismo prefijo, como en
+el formato publicado:
+
+    images = ((0, ('dsc101-001.jpg', 'dsc101-002.jpg')), (1, ('dsc102-001.jpg',)))
+
+from_dict / to_dict convierten desde / hacia el formato de __screencaps.json.
+"""
+
+import sys
+from dataclasses import dataclass
+
+from trekcore_journal import iter_screencaps
+
+# Campos de un registro en el orden de __screencaps.json
+FIELDS = ('series_slug', 'episode_number', 'episode_title', 'screencaps', 'source', 'scraped_at', 'id')
+
+class _Missing:
+    """Campo ausente en el registro original (no se escribe en to_dict)"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+MISSING = _Missing()
+
+def split_url(url):
+    """(prefijo hasta la última '/', nombre de fichero)"""
+    prefix, _, name = url.rpartition('/')
+    return (prefix + '/', name) if prefix else ('', url)
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class UrlPrefixes:
+    """Tabla de prefijos de URL compartida: prefijo <-> id"""
+    __slots__ = ('prefixes', '_ids')
+
+    def __init__(self):
+        self.prefixes = []
+        self._ids = {}
+
+    def id(self, prefix):
+        prefix_id = self._ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = self._ids[prefix] = len(self.prefixes)
+            self.prefixes.append(sys.intern(prefix))
+        return prefix_id
+
+    def encode(self, urls):
+        """URLs -> grupos ((id de prefijo, (nombres...)), ...)"""
+        groups = []
+        for url in urls:
+            prefix, name = split_url(url)
+            prefix_id = self.id(prefix)
+            if groups and groups[-1][0] == prefix_id:
+                groups[-1][1].append(name)
+            else:
+                groups.append((prefix_id, [name]))
+        return tuple((prefix_id, tuple(names)) for prefix_id, names in groups)
+
+    def decode(self, images):
+        """Grupos -> URLs completas"""
+        return [self.prefixes[prefix_id] + name for prefix_id, names in images for name in names]
+
+    def __len__(self):
+        return len(self.prefixes)
+
+@dataclass
+class ScreencapRecord:
+    """Registro de un episodio con sus imágenes como (id de prefijo, nombres)"""
+    __slots__ = ('series_slug', 'episode_number', 'episode_title', 'images', 'source',
+                 'scraped_at', 'id', 'extra')
+    series_slug: str
+    episode_number: str
+    episode_title: object
+    images: tuple
+    source: object
+    scraped_at: object
+    id: object
+    extra: object     # Claves no estándar del dict original (o None)
+
+    @property
+    def key(self):
+        return (self.series_slug, self.episode_number)
+
+    @property
+    def image_count(self):
+        return sum(len(names) for _, names in self.images)
+
+    @classmethod
+    def from_dict(cls, data, prefixes):
+        extra = {key: value for key, value in data.items() if key not in FIELDS}
+        return cls(
+            series_slug=sys.intern(data['series_slug']),
+            episode_number=_intern(data['episode_number']),
+            episode_title=data.get('episode_title', MISSING),
+            images=prefixes.encode(data.get('screencaps', ())),
+            source=_intern(data.get('source', MISSING)),
+            scraped_at=data.get('scraped_at', MISSING),
+            id=data.get('id', MISSING),
+            extra=extra or None
+        )
+
+    def to_dict(self, prefixes, urls=True):
+        """Formato de __screencaps.json (sin 'screencaps' si urls=False)"""
+        data = {}
+        for field in FIELDS:
+            if field == 'screencaps':
+                if urls:
+                    data['screencaps'] = prefixes.decode(self.images)
+                continue
+            value = getattr(self, field)
+            if value is not MISSING:
+                data[field] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+class ScreencapsIndex:
+    """Índice de solo lectura para publicar: {(series_slug, episode_number): ScreencapRecord}
+    en el orden de __screencaps.json"""
+
+    def __init__(self):
+        self.prefixes = UrlPrefixes()
+        self.last_updated = None
+        self._records = {}
+
+    @classmethod
+    def load(cls, path):
+        """Carga __screencaps.json en streaming (sin pasar por la lista de dicts completa).
+        Si una clave se repite, el último registro ocupa el sitio y el id del primero"""
+        index = cls()
+        meta = {}
+        for data in iter_screencaps(path, meta):
+            record = ScreencapRecord.from_dict(data, index.prefixes)
+            previous = index._records.get(record.key)
+            if previous is not None:
+                record.id = previous.id
+            index._records[record.key] = record
+        index.last_updated = meta.get('last_updated')
+        return index
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
+
+    def series(self):
+        """{series_slug: [ScreencapRecord]} en el orden del índice"""
+        by_series = {}
+        for record in self._records.values():
+            by_series.setdefault(record.series_slug, []).append(record)
+        return by_series
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Grabación y reproducción offline de respuestas HTTP.
+
+Con --record ARCHIVO los scrapers guardan cada respuesta (cuerpo + cabeceras) en un
+ZIP comprimido; con --replay ARCHIVO ejecutan scrape_series de principio a fin leyendo
+de ese ZIP, sin red. Las páginas capturadas a mano (trekcore_page.html, ...) se pueden
+añadir a un archivo asociándolas a su URL:
+
+    python3 trekcore_replay.py importar capturas.zip https://academy.trekcore.com/episodes/ trekcore_page.html
+    python3 trekcore_replay.py listar capturas.zip
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import zipfile
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Cabeceras de la respuesta que se guardan en el archivo
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+class ReplayMissError(requests.ConnectionError):
+    """La URL pedida no está en el archivo de reproducción"""
+
+def _entry_name(url):
+    return 'responses/' + hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+def build_response(url, status_code, headers, body):
+    """Construye un requests.Response a partir de datos guardados"""
+    response = requests.models.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers = CaseInsensitiveDict(headers)
+    response.url = url
+    return response
+
+class ResponseRecorder:
+    """Añade respuestas a un archivo ZIP (se puede ampliar en varias ejecuciones)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(path, 'a', compression=zipfile.ZIP_DEFLATED)
+        self._names = set(self._zip.namelist())
+
+    def record(self, url, status_code, headers, body):
+        name = _entry_name(url)
+        with self._lock:
+            # La primera respuesta grabada de cada URL es la que se reproduce
+            if name + '.json' in self._names:
+                return
+            meta = {
+                'url': url,
+                'status_code': status_code,
+                'headers': {key: headers[key] for key in KEPT_HEADERS if key in headers}
+            }
+            self._zip.writestr(name + '.json', json.dumps(meta, ensure_ascii=False))
+            self._zip.writestr(name + '.body', body)
+            self._names.add(name + '.json')
+
+    def record_response(self, url, response):
+        self.record(url, response.status_code, response.headers, response.content)
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+
+class ResponseReplayer:
+    """Sirve respuestas desde un archivo ZIP grabado"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(path, 'r')
+
+    def get(self, url):
+        name = _entry_name(url)
+        with self._lock:
+            try:
+                meta = json.loads(self._zip.read(name + '.json'))
+                body = self._zip.read(name + '.body')
+            except KeyError:
+                raise ReplayMissError(f"URL no grabada en {self.path}: {url}") from None
+        return build_response(url, meta['status_code'], meta['headers'], body)
+
+    def urls(self):
+        """Lista las URLs del archivo"""
+        with self._lock:
+            return [
+                json.loads(self._zip.read(name))['url']
+                for name in self._zip.namelist() if name.endswith('.json')
+            ]
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+
+def import_capture(archive_path, url, html_path):
+    """Añade una página capturada (HTML en disco) al archivo como respuesta 200 de `url`"""
+    with open(html_path, 'rb') as f:
+        body = f.read()
+    recorder = ResponseRecorder(archive_path)
+    try:
+        recorder.record(url, 200, {'Content-Type': 'text/html'}, body)
+    finally:
+        recorder.close()
+
+def main():
+    """Uso: importar ARCHIVO URL FICHERO [URL FICHERO ...] | listar ARCHIVO"""
+    args = sys.argv[1:]
+    if len(args) >= 4 and args[0] == 'importar' and len(args[2:]) % 2 == 0:
+        pairs = args[2:]
+        for url, html_path in zip(pairs[::2], pairs[1::2]):
+            import_capture(args[1], url, html_path)
+            print(f"✅ {html_path} -> {url}")
+    elif len(args) == 2 and args[0] == 'listar':
+        replayer = ResponseReplayer(args[1])
+        for url in sorted(replayer.urls()):
+            print(url)
+        replayer.close()
+    else:
+        print(main.__doc__)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Reintentos con backoff exponencial (con jitter), circuit breaker por host y cola de
+reintentos para los episodios que fallan durante una ejecución.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+# Reintentos por petición
+MAX_ATTEMPTS = 4        # Intentos totales por petición
+BASE_DELAY = 1.0        # Backoff: hasta BASE_DELAY * 2^intento segundos (full jitter)
+MAX_DELAY = 60.0
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# Circuit breaker por host
+BREAKER_WINDOW = 20         # Últimas peticiones que se tienen en cuenta
+BREAKER_MIN_SAMPLES = 5     # Mínimo de peticiones antes de poder abrir el circuito
+BREAKER_FAILURE_RATIO = 0.5 # Proporción de fallos que abre el circuito
+BREAKER_OPEN_SECONDS = 60   # Pausa del host con el circuito abierto
+
+# Cola de reintentos al final de la ejecución
+DRAIN_ROUNDS = 2
+
+def is_transient(error):
+    """True si la excepción es un fallo que puede desaparecer al reintentar (red, timeout,
+    429 / 5xx); False si es permanente (404 y demás 4xx, páginas que no se pueden parsear)"""
+    if isinstance(error, RETRY_EXCEPTIONS):
+        return True
+    response = getattr(error, 'response', None)
+    return (isinstance(error, requests.HTTPError) and response is not None
+            and response.status_code in RETRY_STATUS)
+
+class RetryPolicy:
+    """Backoff exponencial con full jitter"""
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        self.max_attempts = MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.base_delay = BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = MAX_DELAY if max_delay is None else max_delay
+
+    def delay(self, attempt):
+        """Segundos de espera antes del intento attempt + 1 (attempt empieza en 0)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class CircuitBreaker:
+    """Abre el circuito (pausa el host) cuando la tasa de error reciente se dispara"""
+
+    def __init__(self):
+        self.results = deque(maxlen=BREAKER_WINDOW)
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    def wait_time(self):
+        with self.lock:
+            return max(0, self.open_until - time.monotonic())
+
+    def record(self, success):
+        """Registra un resultado. Devuelve True si el circuito acaba de abrirse"""
+        with self.lock:
+            self.results.append(success)
+            failures = self.results.count(False)
+            now = time.monotonic()
+            if (len(self.results) >= BREAKER_MIN_SAMPLES and now >= self.open_until
+                    and failures / len(self.results) >= BREAKER_FAILURE_RATIO):
+                self.open_until = now + BREAKER_OPEN_SECONDS
+                # Tras la pausa el host empieza con el historial limpio (half-open)
+                self.results.clear()
+                return True
+        return False
+
+class CircuitBreakers:
+    """Un CircuitBreaker por host"""
+
+    def __init__(self, log=None):
+        self.log = log
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker()
+            return host, self._breakers[host]
+
+    def wait(self, url):
+        """Bloquea mientras el circuito del host esté abierto"""
+        host, breaker = self._breaker(url)
+        wait = breaker.wait_time()
+        if wait > 0:
+            if self.log:
+                self.log(f"    ⛔ Circuito abierto para {host}: esperando {wait:.0f}s")
+            time.sleep(wait)
+
+    def record(self, url, success):
+        host, breaker = self._breaker(url)
+        if breaker.record(success) and self.log:
+            self.log(f"    ⛔ Demasiados errores en {host}: pausa de {BREAKER_OPEN_SECONDS}s")
+
+class RetryQueue:
+    """Trabajos (episodios) fallidos que se reintentan al final de la ejecución"""
+
+    def __init__(self):
+        self._jobs = []
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        with self._lock:
+            self._jobs.append(job)
+
+    def remove(self, job):
+        """Quita un trabajo de la cola. Devuelve True si estaba encolado"""
+        with self._lock:
+            if job in self._jobs:
+                self._jobs.remove(job)
+                return True
+            return False
+
+    def pop_all(self):
+        with self._lock:
+            jobs, self._jobs = self._jobs, []
+            return jobs
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def drain(self, process, on_record=None, rounds=DRAIN_ROUNDS, log=print):
+        """Reprocesa los trabajos pendientes. process(job) vuelve a encolar si falla.
+        Devuelve los registros obtenidos."""
+        records = []
+        for round_number in range(1, rounds + 1):
+            jobs = self.pop_all()
+            if not jobs:
+                break
+            log(f"🔁 Reintentando {len(jobs)} episodios fallidos (ronda {round_number}/{rounds})")
+            for job in jobs:
+                record = process(job)
+                if record:
+                    records.append(record)
+                    if on_record:
+                        on_record(record)
+
+        for job in self.pop_all():
+            log(f"❌ Sin recuperar tras {rounds} rondas: {job.get('episode_number')} ({job.get('episode_url')})")
+        return records
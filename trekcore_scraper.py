@@ -6,17 +6,29 @@ Extrae fotos promocionales de episodios de Star Trek
 NOTA: Este script ahora usa los selectores CSS correctos basados en la estructura real de TrekCore
 """
 
-import json
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
-import time
 import os
 import re
+import sys
+
+from trekcore_albums import attach_albums
+from trekcore_crawler import crawl
+from trekcore_episodes import EpisodeMetadata
+from trekcore_gallery import stream_gallery_page
+from trekcore_http import http_cache, http_get, set_logger, configure_from_argv
+from trekcore_journal import record_key, rewrite_screencaps, write_json_atomic
+from trekcore_jsonstream import load
+from trekcore_links import RANK_TEXT, best_gallery_link, classify_links
+from trekcore_lock import file_lock
+from trekcore_parsing import parse_html
+from trekcore_publish import publish_screencaps, shard_screencaps
+from trekcore_retry import RetryQueue
+from trekcore_store import open_store
 
 # Configuración
 EPISODES_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__episodes.json'
 SCREENCAPS_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.json'
+SCREENCAPS_DB_PATH = '/home/alex/Projects/startrekar/scripts/trekcore_screencaps.db'
 LOG_FILE = '/home/alex/Projects/startrekar/scripts/trekcore_scraper.log'
 
 # Headers para simular navegador real
@@ -27,6 +39,18 @@ HEADERS = {
     'Connection': 'keep-alive',
 }
 
+# Álbumes preferidos cuando un episodio tiene varios en la galería
+GALLERY_KEYWORDS = ('promotional', 'photos')
+
+# Episodios fallidos durante la ejecución (se reintentan al final)
+retry_queue = RetryQueue()
+
+# Títulos de __episodes.json (se carga una vez y se recarga solo si cambia el fichero)
+episode_metadata = EpisodeMetadata(EPISODES_JSON_PATH)
+
+# Base de datos SQLite de screencaps (solo con --sqlite; si no, se usan los JSON)
+screencaps_store = None
+
 # Series activas en TrekCore
 TREKCORE_SERIES = {
     'star-trek-starfleet-academy': {
@@ -49,16 +73,13 @@ def log(message):
 def load_json(filepath):
     """Carga archivo JSON"""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load(filepath)
     except FileNotFoundError:
         return None
 
 def save_json(filepath, data):
-    """Guarda archivo JSON"""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Guarda archivo JSON (temporal + fsync + rename: nunca queda a medias)"""
+    write_json_atomic(filepath, data)
 
 def extract_episode_number_from_text(text):
     """Extrae número de episodio del texto (1x03, Episode 103, etc.)"""
@@ -79,167 +100,187 @@ def extract_episode_number_from_text(text):
     
     return None
 
-def scrape_episode_page(episode_url, base_url):
-    """Extrae screencaps de una página de episodio buscando el enlace de galería"""
+def find_gallery_link(content):
+    """Busca en una página de episodio el enlace a su galería"""
+    soup = parse_html(content, 'links')
+    
+    # Buscar el enlace de "PROMOTIONAL PHOTOS" que apunta a gallery/thumbnails.php
+    # (o, si no hay, un enlace cuyo texto hable de fotos promocionales)
+    candidate = best_gallery_link(classify_links(soup, text_keywords=GALLERY_KEYWORDS))
+    if candidate is None:
+        return None
+    if candidate['rank'] == RANK_TEXT:
+        log(f"    ✅ Encontrado enlace de galería por texto: {candidate['href']}")
+    else:
+        log(f"    ✅ Encontrado enlace de galería: {candidate['href']}")
+    return candidate['href']
+
+def parse_gallery_images(content, gallery_url):
+    """Extrae las URLs a resolución completa de una página de galería con BeautifulSoup"""
+    gallery_soup = parse_html(content, 'gallery')
+    screencaps = []
+    
+    # Buscar todas las imágenes en la galería
+    all_images = gallery_soup.find_all('img')
+    log(f"    Total de imágenes en galería: {len(all_images)}")
+    
+    for img in all_images:
+        parent = img.find_parent('a')
+        
+        if parent and parent.get('href'):
+            full_res_url = parent.get('href')
+            
+            # Filtrar enlaces que no sean imágenes
+            if not full_res_url.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+                continue
+                
+            # Filtrar imágenes de navegación (next page, etc)
+            if 'thumbnails.php' in full_res_url:
+                continue
+
+            # Asegurar URL absoluta
+            # La base para la galería es https://academy.trekcore.com/gallery/
+            gallery_base = gallery_url.rsplit('/', 1)[0]
+            if not full_res_url.startswith('http'):
+                full_res_url = f"{gallery_base}/{full_res_url}"
+            
+            screencaps.append(full_res_url)
+    
+    return screencaps
+
+def extract_gallery_images(content, gallery_url):
+    """Extrae las URLs a resolución completa de una página de galería.
+    Usa el extractor en streaming (sin árbol) y BeautifulSoup si su resultado no es válido"""
+    screencaps, _ = stream_gallery_page(
+        [content], gallery_url,
+        lambda data: (parse_gallery_images(data, gallery_url), 1), log=log
+    )
+    for full_res_url in screencaps:
+        log(f"      Encontrada: {full_res_url}")
+    return screencaps
+
+def scrape_gallery(gallery_url):
+    """Extrae las URLs de una galería (usa la caché HTTP: si no ha cambiado no se re-parsea)"""
+    log(f"    Accediendo a galería: {gallery_url}")
+    
+    gallery_response = http_get(gallery_url, headers=HEADERS, timeout=30, cache=True)
+    gallery_response.raise_for_status()
+    
+    if gallery_response.from_cache:
+        log("    ♻️  Galería sin cambios (304)")
+    screencaps = http_cache.cached_parse(
+        gallery_response, 'screencaps',
+        lambda: extract_gallery_images(gallery_response.content, gallery_url)
+    )
+    
+    log(f"    Total de screencaps válidos: {len(screencaps)}")
+    return screencaps
+
+def scrape_episode_page(episode_url, base_url, gallery_url=None):
+    """Extrae screencaps de una página de episodio buscando el enlace de galería.
+    Con gallery_url (álbum ya descubierto) se va directamente a la galería.
+    Devuelve None si la descarga falla (para reintentarlo más tarde)"""
     try:
+        if gallery_url:
+            return scrape_gallery(gallery_url)
+        
         log(f"    Scraping página: {episode_url}")
-        response = requests.get(episode_url, headers=HEADERS, timeout=30)
+        response = http_get(episode_url, headers=HEADERS, timeout=30, cache=True)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        screencaps = []
-        
-        # Buscar el enlace de "PROMOTIONAL PHOTOS" que apunta a gallery/thumbnails.php
-        gallery_link = None
-        for link in soup.find_all('a', href=True):
-            if 'gallery/thumbnails.php' in link['href']:
-                gallery_link = link['href']
-                log(f"    ✅ Encontrado enlace de galería: {gallery_link}")
-                break
+        # Si la página no ha cambiado (304) se reutiliza el enlace ya extraído
+        if response.from_cache:
+            log("    ♻️  Página sin cambios (304)")
+        gallery_link = http_cache.cached_parse(response, 'gallery_link', lambda: find_gallery_link(response.content))
         
         if not gallery_link:
-            # Buscar también por texto del enlace
-            for link in soup.find_all('a', href=True):
-                if 'promotional' in link.text.lower() or 'photos' in link.text.lower():
-                    gallery_link = link['href']
-                    log(f"    ✅ Encontrado enlace de galería por texto: {gallery_link}")
-                    break
+            log("    ⚠️  No se encontró enlace de galería en la página")
+            return []
         
-        if gallery_link:
-            # Construir URL completa de la galería
-            if not gallery_link.startswith('http'):
-                gallery_url = f"{base_url}/{gallery_link.lstrip('/')}"
-            else:
-                gallery_url = gallery_link
-            
-            log(f"    Accediendo a galería: {gallery_url}")
-            
-            # Scrape la galería
-            gallery_response = requests.get(gallery_url, headers=HEADERS, timeout=30)
-            gallery_response.raise_for_status()
-            
-            gallery_soup = BeautifulSoup(gallery_response.content, 'html.parser')
-            
-            # Buscar todas las imágenes en la galería
-            all_images = gallery_soup.find_all('img')
-            log(f"    Total de imágenes en galería: {len(all_images)}")
-            
-            for img in all_images:
-                # Verificar si es una miniatura válida
-                src = img.get('src', '')
-                parent = img.find_parent('a')
-                
-                if parent and parent.get('href'):
-                    full_res_url = parent.get('href')
-                    
-                    # Filtrar enlaces que no sean imágenes
-                    if not full_res_url.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                        continue
-                        
-                    # Filtrar imágenes de navegación (next page, etc)
-                    if 'thumbnails.php' in full_res_url:
-                        continue
-
-                    # Asegurar URL absoluta
-                    # La base para la galería es https://academy.trekcore.com/gallery/
-                    gallery_base = gallery_url.rsplit('/', 1)[0]
-                    if not full_res_url.startswith('http'):
-                        full_res_url = f"{gallery_base}/{full_res_url}"
-                    
-                    screencaps.append(full_res_url)
-                    log(f"      Encontrada: {full_res_url}")
-            
-            log(f"    Total de screencaps válidos: {len(screencaps)}")
+        # Construir URL completa de la galería
+        if not gallery_link.startswith('http'):
+            gallery_url = f"{base_url}/{gallery_link.lstrip('/')}"
         else:
-            log(f"    ⚠️  No se encontró enlace de galería en la página")
+            gallery_url = gallery_link
         
-        return screencaps
+        return scrape_gallery(gallery_url)
         
     except Exception as e:
-        log(f"    ❌ Error scraping {episode_url}: {str(e)}")
+        log(f"    ❌ Error scraping {gallery_url or episode_url}: {str(e)}")
         import traceback
         log(f"       {traceback.format_exc()}")
-        return []
+        return None
 
-def scrape_series(series_slug, series_info):
-    """Escanea todos los episodios de una serie"""
+def fetch_album_index(url):
+    """Descarga una página del índice de álbumes de la galería (con caché HTTP)"""
+    response = http_get(url, headers=HEADERS, timeout=30, cache=True)
+    response.raise_for_status()
+    return response.content
+
+def parse_series_index(content, series_slug, series_info):
+    """Extrae del índice de episodios (tabla col1/col2) los episodios a procesar"""
+    soup = parse_html(content, 'series_index')
+    
+    # Buscar todas las filas de la tabla con clase col2 (contienen los enlaces)
+    episode_cells = soup.find_all('td', class_='col2')
+    log(f"  Encontradas {len(episode_cells)} celdas de episodios")
+    
+    jobs = []
+    
+    for cell in episode_cells:
+        link = cell.find('a')
+        if link:
+            episode_url = link.get('href')
+            episode_title = link.text.strip()
+            
+            # Construir URL completa - los enlaces son relativos a /episodes/
+            if not episode_url.startswith('http'):
+                # Si la URL es relativa (season1/sfa-ep101.html), agregarla a episodes_url
+                if not episode_url.startswith('/'):
+                    # Obtener el directorio base de episodes_url
+                    base_dir = series_info['episodes_url'].rsplit('/', 1)[0]
+                    episode_url = f"{base_dir}/{episode_url}"
+                else:
+                    episode_url = f"{series_info['base_url']}{episode_url}"
+            
+            # Buscar el número de episodio en la celda anterior (col1)
+            parent_row = cell.find_parent('tr')
+            if parent_row:
+                ep_num_cell = parent_row.find('td', class_='col1')
+                if ep_num_cell:
+                    ep_text = ep_num_cell.text.strip()
+                    episode_number = extract_episode_number_from_text(ep_text)
+                    
+                    if episode_number:
+                        jobs.append({
+                            'series_slug': series_slug,
+                            'episode_number': episode_number,
+                            'episode_title': episode_title,
+                            'episode_url': episode_url,
+                            'base_url': series_info['base_url']
+                        })
+                    else:
+                        log(f"  ⚠️  No se pudo extraer número de episodio de: {ep_text}")
+    
+    return jobs
+
+def list_series_episodes(series_slug, series_info):
+    """Lee el índice de una serie y devuelve los episodios a procesar"""
     log(f"Scraping {series_info['name']}...")
     
     try:
-        response = requests.get(series_info['episodes_url'], headers=HEADERS, timeout=30)
+        response = http_get(series_info['episodes_url'], headers=HEADERS, timeout=30, cache=True)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Buscar todas las filas de la tabla con clase col2 (contienen los enlaces)
-        episode_cells = soup.find_all('td', class_='col2')
-        log(f"  Encontradas {len(episode_cells)} celdas de episodios")
-        
-        episodes_data = []
-        
-        for cell in episode_cells:
-            link = cell.find('a')
-            if link:
-                episode_url = link.get('href')
-                episode_title = link.text.strip()
-                
-                # Construir URL completa - los enlaces son relativos a /episodes/
-                if not episode_url.startswith('http'):
-                    # Si la URL es relativa (season1/sfa-ep101.html), agregarla a episodes_url
-                    if not episode_url.startswith('/'):
-                        # Obtener el directorio base de episodes_url
-                        base_dir = series_info['episodes_url'].rsplit('/', 1)[0]
-                        episode_url = f"{base_dir}/{episode_url}"
-                    else:
-                        episode_url = f"{series_info['base_url']}{episode_url}"
-                
-                # Buscar el número de episodio en la celda anterior (col1)
-                parent_row = cell.find_parent('tr')
-                if parent_row:
-                    ep_num_cell = parent_row.find('td', class_='col1')
-                    if ep_num_cell:
-                        ep_text = ep_num_cell.text.strip()
-                        episode_number = extract_episode_number_from_text(ep_text)
-                        
-                        if episode_number:
-                            log(f"  Procesando {episode_number}: {episode_title}")
-                            
-                            # Actualizar título si es genérico
-                            if episode_title.startswith('Episode'):
-                                # Buscar título real en __episodes.json
-                                episodes_json = load_json(EPISODES_JSON_PATH)
-                                if episodes_json:
-                                    for ep in episodes_json.get('episodes', []):
-                                        if ep.get('seriesSlug') == series_slug and ep.get('number') == episode_number:
-                                            real_title = ep.get('title', '')
-                                            if real_title and not real_title.startswith('Episode'):
-                                                log(f"    📝 Título actualizado: {episode_title} -> {real_title}")
-                                                episode_title = real_title
-                                            break
-                            
-                            # Scrape la página del episodio
-                            screencaps = scrape_episode_page(episode_url, series_info['base_url'])
-                            
-                            if screencaps:
-                                episodes_data.append({
-                                    'series_slug': series_slug,
-                                    'episode_number': episode_number,
-                                    'episode_title': episode_title,
-                                    'screencaps': screencaps,
-                                    'source': 'trekcore',
-                                    'scraped_at': datetime.now().isoformat()
-                                })
-                                log(f"    ✅ {len(screencaps)} screencaps encontrados")
-                            else:
-                                log(f"    ⚠️  No se encontraron screencaps")
-                            
-                            # Delay para no sobrecargar el servidor
-                            time.sleep(3)
-                        else:
-                            log(f"  ⚠️  No se pudo extraer número de episodio de: {ep_text}")
-        
-        log(f"✅ Total procesado: {len(episodes_data)} episodios con screencaps")
-        return episodes_data
+        if response.from_cache:
+            log("  ♻️  Índice sin cambios (304)")
+        jobs = http_cache.cached_parse(
+            response, 'episodes',
+            lambda: parse_series_index(response.content, series_slug, series_info)
+        )
+        episode_metadata.resolve_titles(jobs)
+        # Ir directamente a los álbumes de la galería, sin pasar por la página de cada episodio
+        return attach_albums(jobs, series_info['base_url'], fetch_album_index, keywords=GALLERY_KEYWORDS, log=log)
         
     except Exception as e:
         log(f"❌ Error scraping series {series_slug}: {str(e)}")
@@ -247,80 +288,134 @@ def scrape_series(series_slug, series_info):
         log(f"   Traceback: {traceback.format_exc()}")
         return []
 
-def update_screencaps_json(new_data):
-    """Actualiza __screencaps.json con nuevos datos"""
-    existing_data = load_json(SCREENCAPS_JSON_PATH)
-    if existing_data is None:
-        existing_data = {'screencaps': [], 'last_updated': None}
+def process_episode(job):
+    """Procesa un episodio del índice y devuelve su registro de screencaps (o None)"""
+    series_slug = job['series_slug']
+    episode_number = job['episode_number']
+    episode_title = job['episode_title']
+    
+    log(f"  Procesando {episode_number}: {episode_title}")
     
-    existing_index = {}
-    for item in existing_data.get('screencaps', []):
-        key = f"{item['series_slug']}_{item['episode_number']}"
-        existing_index[key] = item
+    # Actualizar título si es genérico
+    if episode_title.startswith('Episode'):
+        # Título real en __episodes.json (resuelto para toda la serie al listar los episodios)
+        if 'real_title' not in job:
+            episode_metadata.resolve_titles([job])
+        real_title = job['real_title'] or ''
+        if real_title and not real_title.startswith('Episode'):
+            log(f"    📝 Título actualizado: {episode_title} -> {real_title}")
+            episode_title = real_title
     
-    for new_item in new_data:
-        key = f"{new_item['series_slug']}_{new_item['episode_number']}"
-        existing_index[key] = new_item
+    # Scrape la página del episodio
+    screencaps = scrape_episode_page(job['episode_url'], job['base_url'], job.get('gallery_url'))
     
-    updated_screencaps = list(existing_index.values())
+    if screencaps is None:
+        log(f"    🔁 {episode_number} encolado para reintentar al final")
+        retry_queue.add(job)
+        return None
     
-    save_json(SCREENCAPS_JSON_PATH, {
-        'screencaps': updated_screencaps,
-        'last_updated': datetime.now().isoformat(),
-        'total_episodes': len(updated_screencaps)
-    })
+    if screencaps:
+        log(f"    ✅ {len(screencaps)} screencaps encontrados")
+        return {
+            'series_slug': series_slug,
+            'episode_number': episode_number,
+            'episode_title': episode_title,
+            'screencaps': screencaps,
+            'source': 'trekcore',
+            'scraped_at': datetime.now().isoformat()
+        }
     
-    log(f"✅ Screencaps JSON actualizado: {len(updated_screencaps)} episodios")
+    log("    ⚠️  No se encontraron screencaps")
+    return None
 
-def update_episodes_json():
-    """Actualiza __episodes.json con referencias a gallery"""
-    episodes_data = load_json(EPISODES_JSON_PATH)
-    screencaps_data = load_json(SCREENCAPS_JSON_PATH)
+def scrape_series(series_slug, series_info):
+    """Escanea todos los episodios de una serie"""
+    episodes_data = []
     
-    if not episodes_data or not screencaps_data:
-        log("⚠️ No se pudo cargar datos para actualizar episodes.json")
-        return
+    for job in list_series_episodes(series_slug, series_info):
+        item = process_episode(job)
+        if item:
+            episodes_data.append(item)
     
-    screencaps_index = {}
-    for idx, item in enumerate(screencaps_data.get('screencaps', [])):
-        key = f"{item['series_slug']}_{item['episode_number']}"
-        screencaps_index[key] = idx
+    log(f"✅ Total procesado: {len(episodes_data)} episodios con screencaps")
+    return episodes_data
+
+def update_screencaps_json(new_data):
+    """Actualiza __screencaps.json con nuevos datos.
+    Devuelve {(series_slug, episode_number): id} de los episodios escritos"""
+    if screencaps_store is not None:
+        screencaps_store.upsert(new_data)
+        total = screencaps_store.export_screencaps(SCREENCAPS_JSON_PATH)
+        log(f"✅ Screencaps JSON exportado desde {SCREENCAPS_DB_PATH}: {total} episodios")
+        return screencaps_store.pending_links()
     
-    updated_count = 0
-    for episode in episodes_data.get('episodes', []):
-        key = f"{episode.get('seriesSlug')}_{episode.get('number')}"
-        if key in screencaps_index:
-            if 'gallery' not in episode:
-                episode['gallery'] = []
-            
-            screencap_id = screencaps_index[key]
-            if screencap_id not in episode['gallery']:
-                episode['gallery'].append(screencap_id)
-                updated_count += 1
+    # Bloqueo entre procesos: se fusiona con el fichero tal como está justo antes de escribirlo.
+    # Se lee y se escribe en streaming: los episodios que ya existían conservan su id y los
+    # nuevos reciben el siguiente libre
+    with file_lock(SCREENCAPS_JSON_PATH):
+        total, ids = rewrite_screencaps(SCREENCAPS_JSON_PATH, new_data)
     
-    save_json(EPISODES_JSON_PATH, episodes_data)
+    log(f"✅ Screencaps JSON actualizado: {total} episodios")
+    return {
+        (item['series_slug'], item['episode_number']): ids[record_key(item)]
+        for item in new_data
+    }
+
+def update_episodes_json(links):
+    """Añade a gallery[] de __episodes.json los ids de screencaps de los episodios cambiados
+    ({(series_slug, episode_number): id}), tocando solo esos episodios y con una escritura.
+    Devuelve cuántos episodios cambiaron (None si no se pudo cargar __episodes.json)"""
+    updated_count = episode_metadata.link_gallery(links)
+    if updated_count is None:
+        log("⚠️ No se pudo cargar datos para actualizar episodes.json")
+        return None
     log(f"✅ Episodes JSON actualizado: {updated_count} episodios con gallery")
+    return updated_count
 
 def main():
     """Función principal"""
+    set_logger(log)
+    configure_from_argv(sys.argv)
+    if '--sqlite' in sys.argv:
+        # Escrituras transaccionales en SQLite; los JSON se exportan al terminar
+        global screencaps_store
+        screencaps_store = open_store(SCREENCAPS_DB_PATH, SCREENCAPS_JSON_PATH, log=log)
     log("=" * 70)
     log("🚀 Iniciando TrekCore Scraper")
     log("=" * 70)
     
     all_episodes_data = []
     
-    for series_slug, series_info in TREKCORE_SERIES.items():
-        episodes_data = scrape_series(series_slug, series_info)
-        all_episodes_data.extend(episodes_data)
-        time.sleep(5)
+    if '--async' in sys.argv:
+        # Motor concurrente: todas las series a la vez
+        results = crawl(TREKCORE_SERIES, list_series_episodes, process_episode, log=log)
+        for episodes_data in results.values():
+            all_episodes_data.extend(episodes_data)
+    else:
+        for series_slug, series_info in TREKCORE_SERIES.items():
+            episodes_data = scrape_series(series_slug, series_info)
+            all_episodes_data.extend(episodes_data)
+    
+    all_episodes_data.extend(retry_queue.drain(process_episode, log=log))
     
     if all_episodes_data:
-        update_screencaps_json(all_episodes_data)
-        update_episodes_json()
+        links = update_screencaps_json(all_episodes_data)
+        if screencaps_store is not None:
+            # Los enlaces pendientes están en la base de datos (también los de una ejecución interrumpida)
+            screencaps_store.export_gallery(update_episodes_json)
+        else:
+            update_episodes_json(links)
         log(f"✅ Scraping completado: {len(all_episodes_data)} episodios procesados")
     else:
         log("⚠️ No se encontraron screencaps")
     
+    if '--publish' in sys.argv:
+        # Versión compacta (.min.json + .gz / .br) para el hosting estático del blog
+        publish_screencaps(SCREENCAPS_JSON_PATH, log=log)
+    if '--shards' in sys.argv:
+        # Un fichero por serie (y por episodio con --shard-episodes) + manifest.json
+        shard_screencaps(SCREENCAPS_JSON_PATH, per_episode='--shard-episodes' in sys.argv, log=log)
+
     log("=" * 70)
     log("✅ TrekCore Scraper finalizado")
     log("=" * 70)
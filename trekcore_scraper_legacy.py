@@ -4,20 +4,41 @@ Scraper de Screencaps de TrekCore.com - SERIES LEGACY (TOS, TNG, DS9, VOY, ENT)
 Se ejecuta UNA SOLA VEZ para poblar __screencaps.json con series finalizadas.
 """
 
-import json
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
-import time
 import os
 import re
 import traceback
 import sys
+from functools import partial
+
+from trekcore_albums import attach_albums
+from trekcore_buffer import WriteBehindBuffer
+from trekcore_crawler import crawl
+from trekcore_episodes import EpisodeMetadata
+from trekcore_existing import ExistenceIndex
+from trekcore_frontier import Frontier, crawl_frontier
+from trekcore_gallery import (
+    gallery_page_url, iter_gallery_images, iter_response_chunks, parse_total_pages, stream_gallery_page
+)
+from trekcore_http import http_get, set_logger, configure_from_argv
+from trekcore_journal import ScreencapsJournal, iter_screencaps
+from trekcore_jsonstream import load
+from trekcore_links import RANK_GALLERY_KEYWORD, best_gallery_link, classify_links
+from trekcore_parsing import parse_html
+from trekcore_publish import publish_screencaps, shard_screencaps
+from trekcore_retry import RETRY_STATUS, RetryQueue, is_transient
+from trekcore_store import open_store
 
 # Configuración
 EPISODES_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__episodes.json'
 SCREENCAPS_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.json'
+SCREENCAPS_DB_PATH = '/home/alex/Projects/startrekar/scripts/trekcore_screencaps.db'
+SCREENCAPS_JOURNAL_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.journal.jsonl'
 LOG_FILE = '/home/alex/Projects/startrekar/scripts/trekcore_scraper_legacy.log'
+FRONTIER_PATH = '/home/alex/Projects/startrekar/scripts/trekcore_frontier.db'
+
+# Descargar todas las páginas de cada galería en lugar de muestrear (--full-gallery)
+FULL_GALLERY = False
 
 # Headers para simular navegador real (ROBUSTOS)
 HEADERS = {
@@ -34,23 +55,35 @@ HEADERS = {
 }
 
 def load_existing_screencaps():
-    """Carga los datos actuales para verificar qué ya existe"""
-    if os.path.exists(SCREENCAPS_JSON_PATH):
-        try:
-            with open(SCREENCAPS_JSON_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {'screencaps': []}
-    return {'screencaps': []}
-
-def episode_exists(data, series_slug, episode_number):
-    """Verifica si un episodio ya tiene screencaps"""
-    for ep in data.get('screencaps', []):
-        if ep.get('series_slug') == series_slug and ep.get('episode_number') == episode_number:
-            # Verificar que tenga screencaps
-            if ep.get('screencaps') and len(ep['screencaps']) > 0:
-                return True
-    return False
+    """Carga los episodios actuales (base de datos, o JSON + diario) para verificar qué ya existe"""
+    if screencaps_store is not None:
+        yield from screencaps_store.existing_keys()
+        return
+    # __screencaps.json se lee en streaming: solo se guardan las claves, no los registros
+    try:
+        yield from iter_screencaps(SCREENCAPS_JSON_PATH)
+    except ValueError:
+        log(f"⚠️ No se pudo leer {SCREENCAPS_JSON_PATH}: se ignora para la comprobación de existentes")
+    yield from screencaps_journal.records()
+
+# Episodios con screencaps: se carga una vez por ejecución y se actualiza al guardar
+existing_episodes = ExistenceIndex(load_existing_screencaps)
+
+def episode_exists(series_slug, episode_number):
+    """Verifica si un episodio ya tiene screencaps (sin leer disco)"""
+    return existing_episodes.contains(series_slug, episode_number)
+
+# Episodios fallidos durante la ejecución (se reintentan al final)
+retry_queue = RetryQueue()
+
+# Títulos de __episodes.json (se carga una vez y se recarga solo si cambia el fichero)
+episode_metadata = EpisodeMetadata(EPISODES_JSON_PATH)
+
+# Base de datos SQLite de screencaps (solo con --sqlite; si no, se usan los JSON)
+screencaps_store = None
+
+# Diario de episodios guardados (se compacta en __screencaps.json al terminar)
+screencaps_journal = ScreencapsJournal(SCREENCAPS_JOURNAL_PATH, SCREENCAPS_JSON_PATH)
 
 # Series Legacy en TrekCore
 TREKCORE_LEGACY_SERIES = {
@@ -94,17 +127,10 @@ def log(message):
 def load_json(filepath):
     """Carga archivo JSON"""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load(filepath)
     except FileNotFoundError:
         return None
 
-def save_json(filepath, data):
-    """Guarda archivo JSON"""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
 def extract_episode_number_from_text(text):
     """Extrae número de episodio del texto (1x03, Episode 103, Season 1 Episode 3, etc.)"""
     # Formato 1x03
@@ -130,193 +156,179 @@ def extract_episode_number_from_text(text):
 
 import random
 
+def extract_images_from_soup(soup, base_url_gallery):
+    """Extrae las URLs a resolución completa de una página de galería ya parseada"""
+    imgs = []
+    for img in soup.find_all('img'):
+        parent = img.find_parent('a')
+        if parent and parent.get('href'):
+            full_res_url = parent.get('href')
+            if not full_res_url.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')): continue
+            if 'displayimage.php' in full_res_url or 'thumbnails.php' in full_res_url: continue
+            
+            # Asegurar URL absoluta
+            gallery_base_dir = base_url_gallery.rsplit('/', 1)[0]
+            if not full_res_url.startswith('http'):
+                full_res_url = f"{gallery_base_dir}/{full_res_url}"
+            
+            imgs.append(full_res_url)
+    return imgs
+
+def parse_gallery_soup(content, page_url):
+    """Respaldo con BeautifulSoup: imágenes y total de páginas de una página de galería"""
+    soup = parse_html(content, 'gallery')
+    return extract_images_from_soup(soup, page_url), parse_total_pages(soup.text)
+
+def read_gallery_page(page_url, timeout=30):
+    """Descarga una página de galería procesándola en streaming según llega.
+    Devuelve (imágenes, total_páginas)"""
+    response = http_get(page_url, headers=HEADERS, timeout=timeout, stream=True)
+    response.raise_for_status()
+    return stream_gallery_page(
+        iter_response_chunks(response), page_url,
+        partial(parse_gallery_soup, page_url=page_url),
+        refetch=lambda: http_get(page_url, headers=HEADERS, timeout=timeout).content,
+        log=log
+    )
+
+def fetch_gallery_page_images(page_url):
+    """Descarga una página adicional de galería y devuelve sus imágenes"""
+    # Las imágenes son relativas al directorio de thumbnails.php, igual que en la página 1
+    images, _ = read_gallery_page(page_url, timeout=15)
+    return images
+
+def scrape_gallery(gallery_url):
+    """Extrae screencaps de una galería Coppermine (thumbnails.php?album=N).
+    Devuelve None si la descarga falla por un error transitorio (para reintentarlo más
+    tarde) y [] si el error es permanente (404...)"""
+    log(f"    Accediendo a galería: {gallery_url}")
+    
+    try:
+        # 1. Scrap página 1
+        # 2. Detectar total de páginas
+        # Buscamos texto como: "738 files on 31 page(s)"
+        potential_screencaps, total_pages = read_gallery_page(gallery_url)
+        
+        if total_pages > 1 and FULL_GALLERY:
+            # 3a. Galería completa: todas las páginas en paralelo. Si falla alguna, el
+            # episodio no se guarda a medias: se reintenta (o se descarta si es permanente)
+            log(f"    📚 Galería tiene {total_pages} páginas. Descargando todas en paralelo...")
+            potential_screencaps.extend(iter_gallery_images(
+                gallery_url, range(2, total_pages + 1), fetch_gallery_page_images, log=log
+            ))
+        elif total_pages > 1:
+            # 3b. Seleccionar hasta 5 páginas random del resto
+            log(f"    📄 Galería tiene {total_pages} páginas. Realizando muestreo aleatorio...")
+            pages_pool = list(range(2, total_pages + 1))
+            random_pages = random.sample(pages_pool, min(5, len(pages_pool)))
+            random_pages.sort()
+            
+            log(f"    Explorando páginas adicionales: {random_pages}")
+            
+            for page_num in random_pages:
+                # Construir URL paginada: thumbnails.php?album=193&page=X
+                page_url = gallery_page_url(gallery_url, page_num)
+                try:
+                    potential_screencaps.extend(fetch_gallery_page_images(page_url))
+                except Exception as e:
+                    log(f"    ⚠️ Error en página {page_num}: {e}")
+
+        # Eliminar duplicados (conservando el orden de llegada)
+        potential_screencaps = list(dict.fromkeys(potential_screencaps))
+        
+        total_found = len(potential_screencaps)
+        log(f"    Encontrados {total_found} screencaps potenciales en total")
+        
+        if FULL_GALLERY:
+            # Índice completo: se guardan todas
+            log(f"    📥 Guardando los {total_found} screencaps de la galería completa")
+            return potential_screencaps
+        # SELECCIÓN ALEATORIA DE 20 SCREENCAPS
+        if total_found > 20:
+            log(f"    🎲 Seleccionados 20 screencaps aleatorios de {total_found}")
+            return random.sample(potential_screencaps, 20)
+        log(f"    📥 Seleccionados todos los {total_found} screencaps (menos de 20)")
+        return potential_screencaps
+        
+    except Exception as e:
+        if not is_transient(e):
+            log(f"    ❌ Error permanente en galería {gallery_url}: {str(e)} (no se reintenta)")
+            return []
+        log(f"    ❌ Error scraping galería {gallery_url}: {str(e)}")
+        return None
+
 def scrape_episode_page(episode_url, base_url):
-    """Extrae screencaps de una página de episodio buscando el enlace de galería"""
+    """Extrae screencaps de una página de episodio buscando el enlace de galería.
+    Devuelve None si la descarga falla por un error transitorio (para reintentarlo más tarde)"""
     try:
         log(f"    Scraping página: {episode_url}")
-        response = requests.get(episode_url, headers=HEADERS, timeout=30)
+        response = http_get(episode_url, headers=HEADERS, timeout=30)
         # Algunos sitios legacy pueden dar 404 si el link está mal construido, lo manejamos fuera
         if response.status_code != 200:
             log(f"    ⚠️ Error HTTP {response.status_code} al acceder a {episode_url}")
-            return []
+            # 429/5xx que persisten tras los reintentos: se vuelve a intentar al final
+            return None if response.status_code in RETRY_STATUS else []
             
-        soup = BeautifulSoup(response.content, 'html.parser')
-        screencaps = []
+        soup = parse_html(response.content, 'links')
         
         # Buscar el enlace de "SCREENCAPS", "HD SCREENCAPS"
-        # En sitios legacy suele ser "HD Screencaps" o similar apuntando a gallery/thumbnails.php
-        gallery_link = None
+        # En sitios legacy suele ser "HD Screencaps" o similar apuntando a gallery/thumbnails.php.
+        # Prioridad 1: texto "Screencaps"; prioridad 2: cualquier thumbnails.php
+        candidate = best_gallery_link(classify_links(soup, gallery_keywords=('screencap',)))
+        gallery_link = candidate['href'] if candidate else None
+        if candidate:
+            kind = 'Screencaps' if candidate['rank'] == RANK_GALLERY_KEYWORD else 'Genérico'
+            log(f"    ✅ Encontrado enlace de galería ({kind}): {gallery_link}")
         
-        # Prioridad 1: Buscar por texto explícito "Screencaps" o "HD Screencaps"
-        for link in soup.find_all('a', href=True):
-            text = link.text.lower()
-            if 'screencap' in text and 'gallery/thumbnails.php' in link['href']:
-                gallery_link = link['href']
-                log(f"    ✅ Encontrado enlace de galería (Screencaps): {gallery_link}")
-                break
-                
-        # Prioridad 2: Si no hay específico, buscar cualquier thumbnails.php 
-        # (pero tratando de evitar behind the scenes si es posible, aunque thumbnails.php suele ser el main)
         if not gallery_link:
-            for link in soup.find_all('a', href=True):
-                if 'gallery/thumbnails.php' in link['href']:
-                    gallery_link = link['href']
-                    log(f"    ✅ Encontrado enlace de galería (Genérico): {gallery_link}")
-                    break
+            log("    ⚠️  No se encontró enlace de galería en la página")
+            return []
         
-        if gallery_link:
-            # Construir URL completa de la galería
-            if not gallery_link.startswith('http'):
-                gallery_url = f"{base_url}/{gallery_link.lstrip('/')}"
-            else:
-                gallery_url = gallery_link
-            
-            log(f"    Accediendo a galería: {gallery_url}")
-            
-            # Helper para extraer imágenes de una sopa
-            def extract_images_from_soup(soup, base_url_gallery):
-                imgs = []
-                for img in soup.find_all('img'):
-                    parent = img.find_parent('a')
-                    if parent and parent.get('href'):
-                        full_res_url = parent.get('href')
-                        if not full_res_url.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')): continue
-                        if 'displayimage.php' in full_res_url or 'thumbnails.php' in full_res_url: continue
-                        
-                        # Asegurar URL absoluta
-                        gallery_base_dir = base_url_gallery.rsplit('/', 1)[0]
-                        if not full_res_url.startswith('http'):
-                            full_res_url = f"{gallery_base_dir}/{full_res_url}"
-                        
-                        imgs.append(full_res_url)
-                return imgs
-
-            try:
-                # 1. Scrap página 1
-                gallery_response = requests.get(gallery_url, headers=HEADERS, timeout=30)
-                gallery_response.raise_for_status()
-                gallery_soup = BeautifulSoup(gallery_response.content, 'html.parser')
-                
-                potential_screencaps = extract_images_from_soup(gallery_soup, gallery_url)
-                
-                # 2. Detectar total de páginas para mayor variedad
-                # Buscamos texto como: "738 files on 31 page(s)"
-                total_pages = 1
-                # Buscar en la tabla que contiene esa info (clase tableh1 a veces)
-                page_info_match = re.search(r'(\d+) files on (\d+) page', gallery_soup.text)
-                if page_info_match:
-                    total_pages = int(page_info_match.group(2))
-                    log(f"    📄 Galería tiene {total_pages} páginas. Realizando muestreo aleatorio...")
-
-                # 3. Si hay más páginas, seleccionar hasta 5 aleatorias adicionales
-                if total_pages > 1:
-                    # Seleccionar hasta 5 páginas random del resto
-                    pages_pool = list(range(2, total_pages + 1))
-                    random_pages = random.sample(pages_pool, min(5, len(pages_pool)))
-                    random_pages.sort()
-                    
-                    log(f"    Explorando páginas adicionales: {random_pages}")
-                    
-                    for page_num in random_pages:
-                        # Construir URL paginada: thumbnails.php?album=193&page=X
-                        if '?' in gallery_url:
-                            page_url = f"{gallery_url}&page={page_num}"
-                        else:
-                            page_url = f"{gallery_url}?page={page_num}"
-                            
-                        try:
-                            # Pequeña pausa
-                            time.sleep(0.5) 
-                            p_resp = requests.get(page_url, headers=HEADERS, timeout=15)
-                            if p_resp.status_code == 200:
-                                p_soup = BeautifulSoup(p_resp.content, 'html.parser')
-                                new_imgs = extract_images_from_soup(p_soup, gallery_url)
-                                potential_screencaps.extend(new_imgs)
-                        except Exception as e:
-                            log(f"    ⚠️ Error en página {page_num}: {e}")
-
-                # Eliminar duplicados
-                potential_screencaps = list(set(potential_screencaps))
-                
-                total_found = len(potential_screencaps)
-                log(f"    Encontrados {total_found} screencaps potenciales en total")
-                
-                # SELECCIÓN ALEATORIA DE 20 SCREENCAPS
-                if total_found > 20:
-                    screencaps = random.sample(potential_screencaps, 20)
-                    log(f"    🎲 Seleccionados 20 screencaps aleatorios de {total_found}")
-                else:
-                    screencaps = potential_screencaps
-                    log(f"    📥 Seleccionados todos los {total_found} screencaps (menos de 20)")
-                
-            except Exception as e:
-                log(f"    ❌ Error scraping galería {gallery_url}: {str(e)}")
-
+        # Construir URL completa de la galería
+        if not gallery_link.startswith('http'):
+            gallery_url = f"{base_url}/{gallery_link.lstrip('/')}"
         else:
-            log(f"    ⚠️  No se encontró enlace de galería en la página")
+            gallery_url = gallery_link
         
-        return screencaps
+        return scrape_gallery(gallery_url)
         
     except Exception as e:
+        if not is_transient(e):
+            log(f"    ❌ Error permanente en {episode_url}: {str(e)} (no se reintenta)")
+            return []
         log(f"    ❌ Error scraping {episode_url}: {str(e)}")
-        return []
+        return None
 
-def scrape_series(series_slug, series_info, force_update=False):
-    """Scrapea una serie completa de TrekCore Legacy"""
+def fetch_album_index(url):
+    """Descarga una página del índice de álbumes de la galería"""
+    response = http_get(url, headers=HEADERS, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+def list_series_episodes(series_slug, series_info, force_update=False, raise_errors=False):
+    """Lee el índice de una serie Legacy y devuelve los episodios pendientes de procesar.
+    Si el índice falla devuelve [] (o, con raise_errors, propaga la excepción)"""
     
     log(f"Scraping {series_info['name']}...")
     
-    # Cargar datos existentes para verificar duplicados
-    existing_data = load_existing_screencaps()
-    
     try:
         series_url = series_info['episodes_url']
         log(f"  URL base serie: {series_url}")
         
-        response = requests.get(series_url, headers=HEADERS, timeout=30)
+        response = http_get(series_url, headers=HEADERS, timeout=30)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = parse_html(response.content, 'links')
         
         # En sitios Legacy, suelen usar tablas. Buscamos enlaces que parezcan episodios.
         # TOS: season1/1x01/
         # TNG/DS9/VOY suelen tener estructura similar
         
-        episodes_data = []
-        
-        # Buscar todos los enlaces que contengan "season" en el href
-        # Esto es un patrón común en TrekCore legacy
-        episode_links = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            # Filtros para identificar enlaces a episodios
-            
-            # Caso 1: season1/1x01/ o season1/1x01.html
-            if 'season' in href.lower() and ('x' in href.lower() or 'episode' in href.lower()):
-                 # Verificar que tenga numeros (ej 1x01)
-                 if re.search(r'\d+x\d+', href):
-                     episode_links.append(link)
-            
-            # Caso 2: Archivos .html directos con números (ej 101.html)
-            elif re.search(r'season\d+/\d{3}\.html', href):
-                 episode_links.append(link)
-            
-            # Caso 3: Formato TOS directo (1x01/)
-            elif re.search(r'season\d+/\d+x\d+/?$', href):
-                 episode_links.append(link)
-
-        log(f"  Encontrados {len(episode_links)} posibles enlaces de episodios")
+        jobs = []
         
-        # Filtrar duplicados por URL
-        seen_urls = set()
-        unique_links = []
-        for link in episode_links:
-            href = link['href']
-            # Normalizar URL (quitar slash final para comparar)
-            norm_href = href.rstrip('/')
-            if norm_href not in seen_urls:
-                seen_urls.add(norm_href)
-                unique_links.append(link)
+        # Enlaces a episodios (season1/1x01/, season1/101.html...), sin duplicados
+        unique_links = classify_links(soup)['episodes']
+        log(f"  Encontrados {len(unique_links)} posibles enlaces de episodios")
         
         for link in unique_links:
             episode_url = link.get('href')
@@ -357,143 +369,186 @@ def scrape_series(series_slug, series_info, force_update=False):
             
             if episode_number:
                 # CHECK IF EXISTS
-                if not force_update and episode_exists(existing_data, series_slug, episode_number):
+                if not force_update and episode_exists(series_slug, episode_number):
                     log(f"  ⏭️  Saltando {episode_number} (ya existe)")
                     continue
-
-                log(f"  Procesando {episode_number} (Link: {link_text})")
                 
-                # Buscar título real en __episodes.json para referencia
-                episode_title = link_text
-                episodes_json = load_json(EPISODES_JSON_PATH)
-                if episodes_json:
-                    for ep in episodes_json.get('episodes', []):
-                        if ep.get('seriesSlug') == series_slug and ep.get('number') == episode_number:
-                            episode_title = ep.get('title', episode_title)
-                            break
-                
-                screencaps = scrape_episode_page(episode_url, series_info['base_url'])
-                
-                if screencaps:
-                    # Crear objeto episodio
-                    new_episode_data = {
-                        'series_slug': series_slug,
-                        'episode_number': episode_number,
-                        'episode_title': episode_title,
-                        'screencaps': screencaps,
-                        'source': 'trekcore_legacy',
-                        'scraped_at': datetime.now().isoformat()
-                    }
-                    
-                    episodes_data.append(new_episode_data)
-                    log(f"    ✅ Procesado {episode_number}. Guardando...")
-                    
-                    # GUARDAR INMEDIATAMENTE
-                    update_screencaps_json([new_episode_data])
-                    update_episodes_json()
-                    
-                else:
-                    log(f"    ⚠️  No se encontraron screencaps")
-                
-                # Pausa aleatoria para evitar ser detectado como bot agresivo
-                sleep_time = random.uniform(2.0, 4.0)
-                log(f"    💤 Esperando {sleep_time:.2f}s...")
-                time.sleep(sleep_time)
+                jobs.append({
+                    'series_slug': series_slug,
+                    'episode_number': episode_number,
+                    'episode_title': link_text,
+                    'episode_url': episode_url,
+                    'base_url': series_info['base_url']
+                })
             
-        return episodes_data
+        episode_metadata.resolve_titles(jobs)
+        # Ir directamente a los álbumes de la galería, sin pasar por la página de cada episodio
+        return attach_albums(jobs, series_info['base_url'], fetch_album_index, keywords=('screencap',), log=log)
         
     except Exception as e:
+        if raise_errors:
+            raise
         log(f"❌ Error scraping series {series_slug}: {str(e)}")
         log(f"   {traceback.format_exc()}")
         return []
 
-def update_screencaps_json(new_data):
-    """Actualiza __screencaps.json con nuevos datos (append update)"""
-    existing_data = load_json(SCREENCAPS_JSON_PATH)
-    if existing_data is None:
-        existing_data = {'screencaps': [], 'last_updated': None}
+def process_episode(job):
+    """Procesa un episodio Legacy y devuelve su registro de screencaps (o None)"""
+    series_slug = job['series_slug']
+    episode_number = job['episode_number']
+    link_text = job['episode_title']
     
-    existing_index = {}
-    for item in existing_data.get('screencaps', []):
-        key = f"{item['series_slug']}_{item['episode_number']}"
-        existing_index[key] = item
+    log(f"  Procesando {episode_number} (Link: {link_text})")
     
-    for new_item in new_data:
-        key = f"{new_item['series_slug']}_{new_item['episode_number']}"
-        if key in existing_index:
-             # Si ya existe, podemos optar por Sobreescribir o Ignorar.
-             # Para Legacy, si ya tenemos algo, asumimos que es bueno, pero si estamos re-corriendo para completar, actualizamos.
-             existing_index[key] = new_item
-        else:
-             existing_index[key] = new_item
+    # Buscar título real en __episodes.json para referencia
+    if 'real_title' not in job:
+        episode_metadata.resolve_titles([job])
+    episode_title = job['real_title'] or link_text
     
-    updated_screencaps = list(existing_index.values())
+    if job.get('gallery_url'):
+        screencaps = scrape_gallery(job['gallery_url'])
+    else:
+        screencaps = scrape_episode_page(job['episode_url'], job['base_url'])
     
-    # Ordenar por serie y episodio (opcional, pero util)
+    if screencaps is None:
+        log(f"    🔁 {episode_number} encolado para reintentar al final")
+        retry_queue.add(job)
+        return None
     
-    save_json(SCREENCAPS_JSON_PATH, {
-        'screencaps': updated_screencaps,
-        'last_updated': datetime.now().isoformat(),
-        'total_episodes': len(updated_screencaps)
-    })
+    if screencaps:
+        log(f"    ✅ Procesado {episode_number}. Guardando...")
+        # Crear objeto episodio
+        return {
+            'series_slug': series_slug,
+            'episode_number': episode_number,
+            'episode_title': episode_title,
+            'screencaps': screencaps,
+            'source': 'trekcore_legacy',
+            'scraped_at': datetime.now().isoformat()
+        }
     
-    log(f"✅ Screencaps JSON actualizado. Total: {len(updated_screencaps)} episodios.")
+    log("    ⚠️  No se encontraron screencaps")
+    return None
 
-def update_episodes_json():
-    """Actualiza __episodes.json con referencias a gallery"""
-    episodes_data = load_json(EPISODES_JSON_PATH)
-    screencaps_data = load_json(SCREENCAPS_JSON_PATH)
-    
-    if not episodes_data or not screencaps_data:
-        log("⚠️ No se pudo cargar datos para actualizar episodes.json")
+def save_episode(new_episode_data):
+    """Encola un episodio procesado; se guarda en lote con el siguiente volcado del buffer"""
+    existing_episodes.add(new_episode_data)
+    write_buffer.add(new_episode_data)
+
+def flush_episodes(records):
+    """Vuelca un lote de episodios al diario (o a SQLite); los JSON se compactan aparte"""
+    if screencaps_store is not None:
+        screencaps_store.upsert(records)
+    else:
+        screencaps_journal.append(records)
+
+def compact_screencaps():
+    """Compacta el diario en __screencaps.json y enlaza en __episodes.json los episodios cambiados"""
+    if screencaps_store is not None:
+        if screencaps_store.changed:
+            total = screencaps_store.export_screencaps(SCREENCAPS_JSON_PATH)
+            log(f"✅ Screencaps JSON exportado desde {SCREENCAPS_DB_PATH}. Total: {total} episodios.")
+            screencaps_store.changed.clear()
+        # Enlaces de gallery[] pendientes (también los de una ejecución interrumpida)
+        screencaps_store.export_gallery(update_episodes_json)
         return
+    if not screencaps_journal.pending():
+        return
+    total, links = screencaps_journal.compact()
+    log(f"✅ Screencaps JSON actualizado. Total: {total} episodios.")
+    update_episodes_json(links)
+
+# Buffer write-behind: lotes de FLUSH_EPISODES episodios, cada FLUSH_SECONDS o al recibir
+# SIGINT/SIGTERM; los JSON se compactan cada COMPACT_EPISODES episodios y al terminar
+write_buffer = WriteBehindBuffer(flush_episodes, compact_func=compact_screencaps)
+
+def scrape_series(series_slug, series_info, force_update=False):
+    """Scrapea una serie completa de TrekCore Legacy"""
+    episodes_data = []
     
-    screencaps_index = {}
-    for idx, item in enumerate(screencaps_data.get('screencaps', [])):
-        key = f"{item['series_slug']}_{item['episode_number']}"
-        screencaps_index[key] = idx
-    
-    updated_count = 0
-    for episode in episodes_data.get('episodes', []):
-        key = f"{episode.get('seriesSlug')}_{episode.get('number')}"
-        if key in screencaps_index:
-            if 'gallery' not in episode:
-                episode['gallery'] = []
+    for job in list_series_episodes(series_slug, series_info, force_update):
+        new_episode_data = process_episode(job)
+        
+        if new_episode_data:
+            episodes_data.append(new_episode_data)
             
-            screencap_id = screencaps_index[key]
-            # Solo agregar si no está ya (evitar duplicados si corre varias veces)
-            if screencap_id not in episode.get('gallery', []):
-                # En realidad gallery debería ser solo una referencia al indice o al objeto
-                # Si estamos reconstruyendo todo, podríamos limpiar gallery primero
-                # Pero asumimos append seguro
-                if not episode.get('gallery'):
-                     episode['gallery'] = [screencap_id]
-                elif screencap_id not in episode['gallery']:
-                     episode['gallery'].append(screencap_id)
-                
-                updated_count += 1
+            # GUARDAR INMEDIATAMENTE
+            save_episode(new_episode_data)
     
-    save_json(EPISODES_JSON_PATH, episodes_data)
-    log(f"✅ Episodes JSON actualizado con referencias a galería. Episodios afectados: {updated_count}")
+    return episodes_data
+
+def update_episodes_json(links):
+    """Añade a gallery[] de __episodes.json los ids de screencaps de los episodios cambiados
+    ({(series_slug, episode_number): id}), tocando solo esos episodios y con una escritura.
+    Devuelve cuántos episodios cambiaron (None si no se pudo cargar __episodes.json)"""
+    updated_count = episode_metadata.link_gallery(links)
+    if updated_count is None:
+        log("⚠️ No se pudo cargar datos para actualizar episodes.json")
+        return None
+    log(f"✅ Episodes JSON actualizado: {updated_count} episodios con gallery")
+    return updated_count
 
 
 def main():
     """Función principal"""
+    set_logger(log)
+    configure_from_argv(sys.argv)
+    screencaps_journal.log = log
+    write_buffer.log = log
+    write_buffer.install_signal_handlers()
+    # Diario pendiente de una ejecución interrumpida
+    compact_screencaps()
+    if '--sqlite' in sys.argv:
+        # Escrituras transaccionales en SQLite; los JSON se exportan al terminar
+        global screencaps_store
+        screencaps_store = open_store(SCREENCAPS_DB_PATH, SCREENCAPS_JSON_PATH, log=log)
     # Verificar flag --force
     force_update = '--force' in sys.argv
     
+    # Verificar flag --full-gallery
+    global FULL_GALLERY
+    FULL_GALLERY = '--full-gallery' in sys.argv
+    
     log("=" * 70)
-    log(f"🚀 Iniciando TrekCore LEGACY Scraper (Force: {force_update})")
+    log(f"🚀 Iniciando TrekCore LEGACY Scraper (Force: {force_update}, Galería completa: {FULL_GALLERY})")
     log("=" * 70)
     
     total_processed = 0
     
-    # Iterar sobre las series legacy
-    for series_slug, series_info in TREKCORE_LEGACY_SERIES.items():
-        # scrape_series ya guarda episodio a episodio
-        scrape_series(series_slug, series_info, force_update)
-        time.sleep(2) # Pausa entre series
+    if '--frontier' in sys.argv:
+        # Frontera persistente: retoma la importación donde se quedó la ejecución anterior
+        frontier = Frontier(FRONTIER_PATH)
+        # Cada episodio se añade al diario antes de que la frontera marque su URL como done
+        # (sin lotes en memoria); la compactación de los JSON sigue yendo por lotes
+        write_buffer.max_items = 1
+        if force_update:
+            frontier.clear()
+        # Un índice que falla vuelve a la frontera (frontier.fail) en vez de darse por hecho vacío
+        list_episodes = partial(list_series_episodes, force_update=force_update, raise_errors=True)
+        crawl_frontier(frontier, TREKCORE_LEGACY_SERIES, list_episodes, process_episode,
+                       on_record=save_episode, retry_queue=retry_queue, log=log)
+        for row in frontier.failed():
+            log(f"❌ Fallida: {row['url']} ({row['last_error']})")
+    elif '--async' in sys.argv:
+        # Motor concurrente: todas las series a la vez, guardando cada episodio al terminar
+        list_episodes = partial(list_series_episodes, force_update=force_update)
+        crawl(TREKCORE_LEGACY_SERIES, list_episodes, process_episode, on_record=save_episode, log=log)
+    else:
+        # Iterar sobre las series legacy
+        for series_slug, series_info in TREKCORE_LEGACY_SERIES.items():
+            # scrape_series ya guarda episodio a episodio
+            scrape_series(series_slug, series_info, force_update)
     
+    retry_queue.drain(process_episode, on_record=save_episode, log=log)
+    write_buffer.compact()
+    
+    if '--publish' in sys.argv:
+        # Versión compacta (.min.json + .gz / .br) para el hosting estático del blog
+        publish_screencaps(SCREENCAPS_JSON_PATH, log=log)
+    if '--shards' in sys.argv:
+        # Un fichero por serie (y por episodio con --shard-episodes) + manifest.json
+        shard_screencaps(SCREENCAPS_JSON_PATH, per_episode='--shard-episodes' in sys.argv, log=log)
+
     log("=" * 70)
     log("✅ TrekCore Legacy Scraper finalizado")
     log("=" * 70)
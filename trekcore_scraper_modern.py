@@ -6,18 +6,34 @@ Extrae fotos promocionales de episodios de Star Trek
 NOTA: Este script ahora usa los selectores CSS correctos basados en la estructura real de TrekCore
 """
 
-import json
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
-import time
 import os
 import re
+import sys
+
+from trekcore_albums import attach_albums
+from trekcore_buffer import WriteBehindBuffer
+from trekcore_crawler import crawl
+from trekcore_episodes import EpisodeMetadata
+from trekcore_existing import ExistenceIndex
+from trekcore_fingerprint import IndexFingerprints, fingerprint
+from trekcore_gallery import iter_response_chunks, stream_gallery_page
+from trekcore_http import http_get, set_logger, configure_from_argv
+from trekcore_journal import ScreencapsJournal, iter_screencaps
+from trekcore_jsonstream import load
+from trekcore_links import RANK_TEXT, best_gallery_link, classify_links
+from trekcore_parsing import parse_html
+from trekcore_publish import publish_screencaps, shard_screencaps
+from trekcore_retry import RetryQueue, is_transient
+from trekcore_store import open_store
 
 # Configuración
 EPISODES_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__episodes.json'
 SCREENCAPS_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.json'
+SCREENCAPS_DB_PATH = '/home/alex/Projects/startrekar/scripts/trekcore_screencaps.db'
+SCREENCAPS_JOURNAL_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__screencaps.journal.jsonl'
 LOG_FILE = '/home/alex/Projects/startrekar/scripts/trekcore_scraper.log'
+FINGERPRINTS_PATH = '/home/alex/Projects/startrekar/scripts/trekcore_index_fingerprints.json'
 
 # Headers para simular navegador real
 HEADERS = {
@@ -27,6 +43,24 @@ HEADERS = {
     'Connection': 'keep-alive',
 }
 
+# Álbumes preferidos cuando un episodio tiene varios en la galería
+GALLERY_KEYWORDS = ('promotional', 'photos')
+
+# Huellas de las tablas de episodios (series sin cambios se saltan)
+index_fingerprints = IndexFingerprints(FINGERPRINTS_PATH)
+
+# Episodios fallidos durante la ejecución (se reintentan al final)
+retry_queue = RetryQueue()
+
+# Títulos de __episodes.json (se carga una vez y se recarga solo si cambia el fichero)
+episode_metadata = EpisodeMetadata(EPISODES_JSON_PATH)
+
+# Base de datos SQLite de screencaps (solo con --sqlite; si no, se usan los JSON)
+screencaps_store = None
+
+# Diario de episodios guardados (se compacta en __screencaps.json al terminar)
+screencaps_journal = ScreencapsJournal(SCREENCAPS_JOURNAL_PATH, SCREENCAPS_JSON_PATH)
+
 # Series activas en TrekCore
 TREKCORE_SERIES = {
     'star-trek-discovery': {
@@ -57,23 +91,23 @@ TREKCORE_SERIES = {
 }
 
 def load_existing_screencaps():
-    """Carga los datos actuales para verificar qué ya existe"""
-    if os.path.exists(SCREENCAPS_JSON_PATH):
-        try:
-            with open(SCREENCAPS_JSON_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {'screencaps': []}
-    return {'screencaps': []}
-
-def episode_exists(data, series_slug, episode_number):
-    """Verifica si un episodio ya tiene screencaps"""
-    for ep in data.get('screencaps', []):
-        if ep.get('series_slug') == series_slug and ep.get('episode_number') == episode_number:
-            # Verificar que tenga screencaps
-            if ep.get('screencaps') and len(ep['screencaps']) > 0:
-                return True
-    return False
+    """Carga los episodios actuales (base de datos, o JSON + diario) para verificar qué ya existe"""
+    if screencaps_store is not None:
+        yield from screencaps_store.existing_keys()
+        return
+    # __screencaps.json se lee en streaming: solo se guardan las claves, no los registros
+    try:
+        yield from iter_screencaps(SCREENCAPS_JSON_PATH)
+    except ValueError:
+        log(f"⚠️ No se pudo leer {SCREENCAPS_JSON_PATH}: se ignora para la comprobación de existentes")
+    yield from screencaps_journal.records()
+
+# Episodios con screencaps: se carga una vez por ejecución y se actualiza al guardar
+existing_episodes = ExistenceIndex(load_existing_screencaps)
+
+def episode_exists(series_slug, episode_number):
+    """Verifica si un episodio ya tiene screencaps (sin leer disco)"""
+    return existing_episodes.contains(series_slug, episode_number)
 
 def log(message):
     """Registra mensaje en log y consola"""
@@ -88,17 +122,10 @@ def log(message):
 def load_json(filepath):
     """Carga archivo JSON"""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load(filepath)
     except FileNotFoundError:
         return None
 
-def save_json(filepath, data):
-    """Guarda archivo JSON"""
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
 def extract_episode_number_from_text(text):
     """Extrae número de episodio del texto (1x03, Episode 103, etc.)"""
     # Formato 1x03
@@ -118,103 +145,127 @@ def extract_episode_number_from_text(text):
     
     return None
 
-def scrape_episode_page(episode_url, base_url):
-    """Extrae screencaps de una página de episodio buscando el enlace de galería"""
+def parse_gallery_images(content, gallery_url):
+    """Extrae las URLs a resolución completa de una página de galería con BeautifulSoup"""
+    gallery_soup = parse_html(content, 'gallery')
+    screencaps = []
+    
+    # Buscar todas las imágenes en la galería
+    all_images = gallery_soup.find_all('img')
+    log(f"    Total de imágenes en galería: {len(all_images)}")
+    
+    for img in all_images:
+        parent = img.find_parent('a')
+        
+        if parent and parent.get('href'):
+            full_res_url = parent.get('href')
+            
+            # Filtrar enlaces que no sean imágenes
+            if not full_res_url.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+                continue
+                
+            # Filtrar imágenes de navegación (next page, etc)
+            if 'thumbnails.php' in full_res_url:
+                continue
+
+            # Asegurar URL absoluta
+            # La base para la galería es https://academy.trekcore.com/gallery/
+            gallery_base = gallery_url.rsplit('/', 1)[0]
+            if not full_res_url.startswith('http'):
+                full_res_url = f"{gallery_base}/{full_res_url}"
+            
+            screencaps.append(full_res_url)
+    
+    return screencaps
+
+def scrape_gallery(gallery_url):
+    """Extrae las URLs a resolución completa de una galería (thumbnails.php?album=N).
+    La página se procesa en streaming según llega; BeautifulSoup queda como respaldo"""
+    log(f"    Accediendo a galería: {gallery_url}")
+    
+    # Scrape la galería
+    gallery_response = http_get(gallery_url, headers=HEADERS, timeout=30, stream=True)
+    gallery_response.raise_for_status()
+    
+    screencaps, _ = stream_gallery_page(
+        iter_response_chunks(gallery_response), gallery_url,
+        lambda content: (parse_gallery_images(content, gallery_url), 1),
+        refetch=lambda: http_get(gallery_url, headers=HEADERS, timeout=30).content,
+        log=log
+    )
+    for full_res_url in screencaps:
+        log(f"      Encontrada: {full_res_url}")
+    
+    log(f"    Total de screencaps válidos: {len(screencaps)}")
+    return screencaps
+
+def scrape_episode_page(episode_url, base_url, gallery_url=None):
+    """Extrae screencaps de una página de episodio buscando el enlace de galería.
+    Con gallery_url (álbum ya descubierto) se va directamente a la galería.
+    Devuelve None si la descarga falla por un error transitorio (para reintentarlo más
+    tarde) y [] si el error es permanente (404...)"""
     try:
+        if gallery_url:
+            return scrape_gallery(gallery_url)
+        
         log(f"    Scraping página: {episode_url}")
-        response = requests.get(episode_url, headers=HEADERS, timeout=30)
+        response = http_get(episode_url, headers=HEADERS, timeout=30)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        screencaps = []
+        soup = parse_html(response.content, 'links')
         
         # Buscar el enlace de "PROMOTIONAL PHOTOS" que apunta a gallery/thumbnails.php
-        gallery_link = None
-        for link in soup.find_all('a', href=True):
-            if 'gallery/thumbnails.php' in link['href']:
-                gallery_link = link['href']
-                log(f"    ✅ Encontrado enlace de galería: {gallery_link}")
-                break
+        # (o, si no hay, un enlace cuyo texto hable de fotos promocionales)
+        candidate = best_gallery_link(classify_links(soup, text_keywords=GALLERY_KEYWORDS))
+        gallery_link = candidate['href'] if candidate else None
+        if candidate and candidate['rank'] == RANK_TEXT:
+            log(f"    ✅ Encontrado enlace de galería por texto: {gallery_link}")
+        elif candidate:
+            log(f"    ✅ Encontrado enlace de galería: {gallery_link}")
         
         if not gallery_link:
-            # Buscar también por texto del enlace
-            for link in soup.find_all('a', href=True):
-                if 'promotional' in link.text.lower() or 'photos' in link.text.lower():
-                    gallery_link = link['href']
-                    log(f"    ✅ Encontrado enlace de galería por texto: {gallery_link}")
-                    break
+            log("    ⚠️  No se encontró enlace de galería en la página")
+            return []
         
-        if gallery_link:
-            # Construir URL completa de la galería
-            if not gallery_link.startswith('http'):
-                gallery_url = f"{base_url}/{gallery_link.lstrip('/')}"
-            else:
-                gallery_url = gallery_link
-            
-            log(f"    Accediendo a galería: {gallery_url}")
-            
-            # Scrape la galería
-            gallery_response = requests.get(gallery_url, headers=HEADERS, timeout=30)
-            gallery_response.raise_for_status()
-            
-            gallery_soup = BeautifulSoup(gallery_response.content, 'html.parser')
-            
-            # Buscar todas las imágenes en la galería
-            all_images = gallery_soup.find_all('img')
-            log(f"    Total de imágenes en galería: {len(all_images)}")
-            
-            for img in all_images:
-                # Verificar si es una miniatura válida
-                src = img.get('src', '')
-                parent = img.find_parent('a')
-                
-                if parent and parent.get('href'):
-                    full_res_url = parent.get('href')
-                    
-                    # Filtrar enlaces que no sean imágenes
-                    if not full_res_url.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                        continue
-                        
-                    # Filtrar imágenes de navegación (next page, etc)
-                    if 'thumbnails.php' in full_res_url:
-                        continue
-
-                    # Asegurar URL absoluta
-                    # La base para la galería es https://academy.trekcore.com/gallery/
-                    gallery_base = gallery_url.rsplit('/', 1)[0]
-                    if not full_res_url.startswith('http'):
-                        full_res_url = f"{gallery_base}/{full_res_url}"
-                    
-                    screencaps.append(full_res_url)
-                    log(f"      Encontrada: {full_res_url}")
-            
-            log(f"    Total de screencaps válidos: {len(screencaps)}")
+        # Construir URL completa de la galería
+        if not gallery_link.startswith('http'):
+            gallery_url = f"{base_url}/{gallery_link.lstrip('/')}"
         else:
-            log(f"    ⚠️  No se encontró enlace de galería en la página")
+            gallery_url = gallery_link
         
-        return screencaps
+        return scrape_gallery(gallery_url)
         
     except Exception as e:
-        log(f"    ❌ Error scraping {episode_url}: {str(e)}")
+        if not is_transient(e):
+            log(f"    ❌ Error permanente en {gallery_url or episode_url}: {str(e)} (no se reintenta)")
+            return []
+        log(f"    ❌ Error scraping {gallery_url or episode_url}: {str(e)}")
         import traceback
         log(f"       {traceback.format_exc()}")
-        return []
+        return None
 
-def scrape_series(series_slug, series_info):
-    """Escanea todos los episodios de una serie"""
+def fetch_album_index(url):
+    """Descarga una página del índice de álbumes de la galería"""
+    response = http_get(url, headers=HEADERS, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+def list_series_episodes(series_slug, series_info):
+    """Lee el índice de una serie y devuelve los episodios pendientes de procesar.
+    Si la tabla de episodios no ha cambiado desde la última ejecución la serie se salta"""
     log(f"Scraping {series_info['name']}...")
     
     try:
-        response = requests.get(series_info['episodes_url'], headers=HEADERS, timeout=30)
+        response = http_get(series_info['episodes_url'], headers=HEADERS, timeout=30, cache=True)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = parse_html(response.content, 'series_index')
         
         # Buscar todas las filas de la tabla con clase col2 (contienen los enlaces)
         episode_cells = soup.find_all('td', class_='col2')
         log(f"  Encontradas {len(episode_cells)} celdas de episodios")
         
-        episodes_data = []
+        rows = []
         
         for cell in episode_cells:
             link = cell.find('a')
@@ -241,55 +292,53 @@ def scrape_series(series_slug, series_info):
                         episode_number = extract_episode_number_from_text(ep_text)
                         
                         if episode_number:
-                            # CHECK IF EXISTS
-                            existing_data = load_existing_screencaps()
-                            if episode_exists(existing_data, series_slug, episode_number):
-                                log(f"  ⏭️  Saltando {episode_number} (ya existe)")
-                                continue
-
-                            log(f"  Procesando {episode_number}: {episode_title}")
-                            
-                            # Actualizar título si es genérico
-                            if episode_title.startswith('Episode'):
-                                # Buscar título real en __episodes.json
-                                episodes_json = load_json(EPISODES_JSON_PATH)
-                                if episodes_json:
-                                    for ep in episodes_json.get('episodes', []):
-                                        if ep.get('seriesSlug') == series_slug and ep.get('number') == episode_number:
-                                            real_title = ep.get('title', '')
-                                            if real_title and not real_title.startswith('Episode'):
-                                                log(f"    📝 Título actualizado: {episode_title} -> {real_title}")
-                                                episode_title = real_title
-                                            break
-                            
-                            # Scrape la página del episodio
-                            screencaps = scrape_episode_page(episode_url, series_info['base_url'])
-                            
-                            if screencaps:
-                                item = {
-                                    'series_slug': series_slug,
-                                    'episode_number': episode_number,
-                                    'episode_title': episode_title,
-                                    'screencaps': screencaps,
-                                    'source': 'trekcore',
-                                    'scraped_at': datetime.now().isoformat()
-                                }
-                                episodes_data.append(item)
-                                log(f"    ✅ {len(screencaps)} screencaps encontrados. Guardando...")
-                                
-                                # GUARDAR INMEDIATAMENTE
-                                update_screencaps_json([item])
-                                update_episodes_json()
-                            else:
-                                log(f"    ⚠️  No se encontraron screencaps")
-                            
-                            # Delay para no sobrecargar el servidor
-                            time.sleep(3)
+                            rows.append({
+                                'series_slug': series_slug,
+                                'episode_number': episode_number,
+                                'episode_title': episode_title,
+                                'episode_url': episode_url,
+                                'base_url': series_info['base_url'],
+                                'row_fingerprint': fingerprint(ep_text, episode_title, episode_url)
+                            })
                         else:
                             log(f"  ⚠️  No se pudo extraer número de episodio de: {ep_text}")
         
-        log(f"✅ Total procesado: {len(episodes_data)} episodios con screencaps")
-        return episodes_data
+        # Tabla idéntica a la última ejecución y sin filas pendientes que toque reintentar
+        index_hash = fingerprint(*(row['row_fingerprint'] for row in rows))
+        if index_fingerprints.series_unchanged(series_slug, index_hash):
+            log("  ⏭️  Índice sin cambios, se salta la serie")
+            return []
+        
+        jobs = []
+        waiting = []
+        for row in rows:
+            episode_number = row['episode_number']
+            # Fila ya procesada en una ejecución anterior
+            if index_fingerprints.row_done(series_slug, episode_number, row['row_fingerprint']):
+                continue
+            # Pendiente (sin galería todavía) y sin cambios: se reintenta más adelante
+            if index_fingerprints.row_waiting(series_slug, episode_number, row['row_fingerprint']):
+                waiting.append(episode_number)
+                continue
+            
+            # CHECK IF EXISTS
+            if episode_exists(series_slug, episode_number):
+                log(f"  ⏭️  Saltando {episode_number} (ya existe)")
+                index_fingerprints.mark_done(series_slug, episode_number, row['row_fingerprint'])
+                continue
+            
+            jobs.append(row)
+        
+        log(f"  🆕 {len(jobs)} filas nuevas o modificadas de {len(rows)} ({len(waiting)} pendientes en espera)")
+        index_fingerprints.set_index(
+            series_slug, index_hash,
+            {job['episode_number']: job['row_fingerprint'] for job in jobs},
+            waiting
+        )
+        
+        episode_metadata.resolve_titles(jobs)
+        # Ir directamente a los álbumes de la galería, sin pasar por la página de cada episodio
+        return attach_albums(jobs, series_info['base_url'], fetch_album_index, keywords=GALLERY_KEYWORDS, log=log)
         
     except Exception as e:
         log(f"❌ Error scraping series {series_slug}: {str(e)}")
@@ -297,70 +346,141 @@ def scrape_series(series_slug, series_info):
         log(f"   Traceback: {traceback.format_exc()}")
         return []
 
-def update_screencaps_json(new_data):
-    """Actualiza __screencaps.json con nuevos datos"""
-    existing_data = load_json(SCREENCAPS_JSON_PATH)
-    if existing_data is None:
-        existing_data = {'screencaps': [], 'last_updated': None}
+def process_episode(job):
+    """Procesa un episodio del índice y devuelve su registro de screencaps (o None)"""
+    series_slug = job['series_slug']
+    episode_number = job['episode_number']
+    episode_title = job['episode_title']
     
-    existing_index = {}
-    for item in existing_data.get('screencaps', []):
-        key = f"{item['series_slug']}_{item['episode_number']}"
-        existing_index[key] = item
+    log(f"  Procesando {episode_number}: {episode_title}")
     
-    for new_item in new_data:
-        key = f"{new_item['series_slug']}_{new_item['episode_number']}"
-        existing_index[key] = new_item
+    # Actualizar título si es genérico
+    if episode_title.startswith('Episode'):
+        # Título real en __episodes.json (resuelto para toda la serie al listar los episodios)
+        if 'real_title' not in job:
+            episode_metadata.resolve_titles([job])
+        real_title = job['real_title'] or ''
+        if real_title and not real_title.startswith('Episode'):
+            log(f"    📝 Título actualizado: {episode_title} -> {real_title}")
+            episode_title = real_title
     
-    updated_screencaps = list(existing_index.values())
+    # Scrape la página del episodio
+    screencaps = scrape_episode_page(job['episode_url'], job['base_url'], job.get('gallery_url'))
     
-    save_json(SCREENCAPS_JSON_PATH, {
-        'screencaps': updated_screencaps,
-        'last_updated': datetime.now().isoformat(),
-        'total_episodes': len(updated_screencaps)
-    })
+    if screencaps is None:
+        log(f"    🔁 {episode_number} encolado para reintentar al final")
+        retry_queue.add(job)
+        return None
     
-    log(f"✅ Screencaps JSON actualizado: {len(updated_screencaps)} episodios")
-
-def update_episodes_json():
-    """Actualiza __episodes.json con referencias a gallery"""
-    episodes_data = load_json(EPISODES_JSON_PATH)
-    screencaps_data = load_json(SCREENCAPS_JSON_PATH)
+    if screencaps:
+        log(f"    ✅ {len(screencaps)} screencaps encontrados. Guardando...")
+        return {
+            'series_slug': series_slug,
+            'episode_number': episode_number,
+            'episode_title': episode_title,
+            'screencaps': screencaps,
+            'source': 'trekcore',
+            'scraped_at': datetime.now().isoformat()
+        }
     
-    if not episodes_data or not screencaps_data:
-        log("⚠️ No se pudo cargar datos para actualizar episodes.json")
+    log("    ⚠️  No se encontraron screencaps")
+    return None
+
+def save_episode(item):
+    """Encola un episodio procesado; se guarda en lote con el siguiente volcado del buffer"""
+    existing_episodes.add(item)
+    write_buffer.add(item)
+
+def flush_episodes(records):
+    """Vuelca un lote de episodios al diario (o a SQLite); los JSON se compactan aparte"""
+    if screencaps_store is not None:
+        screencaps_store.upsert(records)
+    else:
+        screencaps_journal.append(records)
+    # Las filas dejan de estar pendientes: no se vuelven a procesar mientras no cambien
+    for item in records:
+        index_fingerprints.mark_done(item['series_slug'], item['episode_number'])
+
+def compact_screencaps():
+    """Compacta el diario en __screencaps.json y enlaza en __episodes.json los episodios cambiados"""
+    if screencaps_store is not None:
+        if screencaps_store.changed:
+            total = screencaps_store.export_screencaps(SCREENCAPS_JSON_PATH)
+            log(f"✅ Screencaps JSON exportado desde {SCREENCAPS_DB_PATH}. Total: {total} episodios.")
+            screencaps_store.changed.clear()
+        # Enlaces de gallery[] pendientes (también los de una ejecución interrumpida)
+        screencaps_store.export_gallery(update_episodes_json)
         return
+    if not screencaps_journal.pending():
+        return
+    total, links = screencaps_journal.compact()
+    log(f"✅ Screencaps JSON actualizado. Total: {total} episodios.")
+    update_episodes_json(links)
+
+# Buffer write-behind: lotes de FLUSH_EPISODES episodios, cada FLUSH_SECONDS o al recibir
+# SIGINT/SIGTERM; los JSON se compactan cada COMPACT_EPISODES episodios y al terminar
+write_buffer = WriteBehindBuffer(flush_episodes, compact_func=compact_screencaps)
+
+def scrape_series(series_slug, series_info):
+    """Escanea todos los episodios de una serie"""
+    episodes_data = []
     
-    screencaps_index = {}
-    for idx, item in enumerate(screencaps_data.get('screencaps', [])):
-        key = f"{item['series_slug']}_{item['episode_number']}"
-        screencaps_index[key] = idx
-    
-    updated_count = 0
-    for episode in episodes_data.get('episodes', []):
-        key = f"{episode.get('seriesSlug')}_{episode.get('number')}"
-        if key in screencaps_index:
-            if 'gallery' not in episode:
-                episode['gallery'] = []
+    for job in list_series_episodes(series_slug, series_info):
+        item = process_episode(job)
+        if item:
+            episodes_data.append(item)
             
-            screencap_id = screencaps_index[key]
-            if screencap_id not in episode['gallery']:
-                episode['gallery'].append(screencap_id)
-                updated_count += 1
+            # GUARDAR INMEDIATAMENTE
+            save_episode(item)
     
-    save_json(EPISODES_JSON_PATH, episodes_data)
+    log(f"✅ Total procesado: {len(episodes_data)} episodios con screencaps")
+    return episodes_data
+
+def update_episodes_json(links):
+    """Añade a gallery[] de __episodes.json los ids de screencaps de los episodios cambiados
+    ({(series_slug, episode_number): id}), tocando solo esos episodios y con una escritura.
+    Devuelve cuántos episodios cambiaron (None si no se pudo cargar __episodes.json)"""
+    updated_count = episode_metadata.link_gallery(links)
+    if updated_count is None:
+        log("⚠️ No se pudo cargar datos para actualizar episodes.json")
+        return None
     log(f"✅ Episodes JSON actualizado: {updated_count} episodios con gallery")
+    return updated_count
 
 def main():
     """Función principal"""
+    set_logger(log)
+    configure_from_argv(sys.argv)
+    screencaps_journal.log = log
+    write_buffer.log = log
+    write_buffer.install_signal_handlers()
+    # Diario pendiente de una ejecución interrumpida
+    compact_screencaps()
+    if '--sqlite' in sys.argv:
+        # Escrituras transaccionales en SQLite; los JSON se exportan al terminar
+        global screencaps_store
+        screencaps_store = open_store(SCREENCAPS_DB_PATH, SCREENCAPS_JSON_PATH, log=log)
     log("=" * 70)
     log("🚀 Iniciando TrekCore Scraper")
     log("=" * 70)
     
-    for series_slug, series_info in TREKCORE_SERIES.items():
-        scrape_series(series_slug, series_info)
-        time.sleep(5)
+    if '--async' in sys.argv:
+        # Motor concurrente: todas las series a la vez, guardando cada episodio al terminar
+        crawl(TREKCORE_SERIES, list_series_episodes, process_episode, on_record=save_episode, log=log)
+    else:
+        for series_slug, series_info in TREKCORE_SERIES.items():
+            scrape_series(series_slug, series_info)
+    
+    retry_queue.drain(process_episode, on_record=save_episode, log=log)
+    write_buffer.compact()
     
+    if '--publish' in sys.argv:
+        # Versión compacta (.min.json + .gz / .br) para el hosting estático del blog
+        publish_screencaps(SCREENCAPS_JSON_PATH, log=log)
+    if '--shards' in sys.argv:
+        # Un fichero por serie (y por episodio con --shard-episodes) + manifest.json
+        shard_screencaps(SCREENCAPS_JSON_PATH, per_episode='--shard-episodes' in sys.argv, log=log)
+
     log("=" * 70)
     log("✅ TrekCore Scraper finalizado")
     log("=" * 70)
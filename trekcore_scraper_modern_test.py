@@ -7,13 +7,13 @@ NOTA: Este script ahora usa los selectores CSS correctos basados en la estructur
 """
 
 import json
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
-import time
 import os
 import re
 
+from trekcore_http import http_get, set_logger
+
 # Configuración
 EPISODES_JSON_PATH = '/home/alex/Projects/startrekar/old/src/data/jsons/__episodes.json'
 SCREENCAPS_JSON_PATH = '/home/alex/Projects/startrekar/scripts/test_modern_screencaps.json'
@@ -83,7 +83,7 @@ def scrape_episode_page(episode_url, base_url):
     """Extrae screencaps de una página de episodio buscando el enlace de galería"""
     try:
         log(f"    Scraping página: {episode_url}")
-        response = requests.get(episode_url, headers=HEADERS, timeout=30)
+        response = http_get(episode_url, headers=HEADERS, timeout=30)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.content, 'html.parser')
@@ -115,7 +115,7 @@ def scrape_episode_page(episode_url, base_url):
             log(f"    Accediendo a galería: {gallery_url}")
             
             # Scrape la galería
-            gallery_response = requests.get(gallery_url, headers=HEADERS, timeout=30)
+            gallery_response = http_get(gallery_url, headers=HEADERS, timeout=30)
             gallery_response.raise_for_status()
             
             gallery_soup = BeautifulSoup(gallery_response.content, 'html.parser')
@@ -166,7 +166,7 @@ def scrape_series(series_slug, series_info):
     log(f"Scraping {series_info['name']}...")
     
     try:
-        response = requests.get(series_info['episodes_url'], headers=HEADERS, timeout=30)
+        response = http_get(series_info['episodes_url'], headers=HEADERS, timeout=30)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.content, 'html.parser')
@@ -233,8 +233,6 @@ def scrape_series(series_slug, series_info):
                             else:
                                 log(f"    ⚠️  No se encontraron screencaps")
                             
-                            # Delay para no sobrecargar el servidor
-                            time.sleep(3)
                             break # TEST ONLY
                         else:
                             log(f"  ⚠️  No se pudo extraer número de episodio de: {ep_text}")
@@ -304,6 +302,7 @@ def update_episodes_json():
 
 def main():
     """Función principal"""
+    set_logger(log)
     log("=" * 70)
     log("🚀 Iniciando TrekCore Scraper")
     log("=" * 70)
@@ -313,7 +312,6 @@ def main():
     for series_slug, series_info in TREKCORE_SERIES.items():
         episodes_data = scrape_series(series_slug, series_info)
         all_episodes_data.extend(episodes_data)
-        time.sleep(5)
     
     if all_episodes_data:
         update_screencaps_json(all_episodes_data)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Almacenamiento de screencaps en SQLite (alternativa a reescribir los JSON).
+
+Cada episodio es una fila de `episodes` con clave (series_slug, episode_number) y cada URL
+una fila de `screencaps`. El id de un episodio (campo id de __screencaps.json, lo que se
+guarda en gallery[] de __episodes.json) no cambia al actualizarlo, y al importar
+__screencaps.json se conserva el del fichero (si choca con otro episodio, la importación
+falla en lugar de asignar uno distinto). Los ids nuevos se reservan bajo el bloqueo de
+__screencaps.json en el mismo contador que usa el diario (reserved_next_id), después de
+importar lo que otro proceso haya escrito en el fichero: ambos modos no repiten ids. Cada enlace de gallery[] que falta por escribir es
+una fila de `gallery_links`. Las escrituras van en transacciones IMMEDIATE, así que varios
+scrapers en paralelo sobre el mismo fichero no se pisan; __screencaps.json se regenera con
+export_screencaps y los gallery[] de __episodes.json con export_gallery.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from itertools import groupby
+
+from trekcore_journal import iter_screencaps, reserve_next_id, reserved_next_id
+from trekcore_jsonstream import write_array_atomic
+from trekcore_lock import file_lock, file_version
+
+IMPORT_BATCH = 500      # Registros por transacción al importar __screencaps.json
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER NOT NULL UNIQUE,
+    series_slug TEXT NOT NULL,
+    episode_number TEXT NOT NULL,
+    episode_title TEXT,
+    source TEXT,
+    scraped_at TEXT,
+    PRIMARY KEY (series_slug, episode_number)
+);
+CREATE TABLE IF NOT EXISTS screencaps (
+    series_slug TEXT NOT NULL,
+    episode_number TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (series_slug, episode_number, position)
+);
+CREATE TABLE IF NOT EXISTS gallery_links (
+    series_slug TEXT NOT NULL,
+    episode_number TEXT NOT NULL,
+    screencap_id INTEGER NOT NULL,
+    exported INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (series_slug, episode_number, screencap_id)
+);
+"""
+
+UPSERT_EPISODE = """
+INSERT INTO episodes (id, series_slug, episode_number, episode_title, source, scraped_at)
+VALUES (COALESCE(?, (SELECT COALESCE(MAX(id) + 1, 0) FROM episodes)), ?, ?, ?, ?, ?)
+ON CONFLICT (series_slug, episode_number) DO UPDATE SET
+    episode_title = excluded.episode_title,
+    source = excluded.source,
+    scraped_at = excluded.scraped_at
+"""
+
+class ScreencapsStore:
+    """Screencaps indexados por (series_slug, episode_number), una fila por imagen"""
+
+    def __init__(self, path, screencaps_path=None):
+        self.path = path
+        self.screencaps_path = screencaps_path     # __screencaps.json con el que comparte ids
+        self._local = threading.local()
+        self.changed = set()    # Episodios scrapeados por este proceso (no los importados)
+        self._json_version = None   # __screencaps.json en la última importación / exportación
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    class _Transaction:
+        def __init__(self, db):
+            self.db = db
+
+        def __enter__(self):
+            # IMMEDIATE: otro proceso que escriba a la vez espera en lugar de pisar los datos
+            self.db.execute('BEGIN IMMEDIATE')
+            return self.db
+
+        def __exit__(self, exc_type, exc, tb):
+            self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+    def _transaction(self):
+        return self._Transaction(self._db())
+
+    def upsert(self, records, replace=True):
+        """Inserta o actualiza un lote de registros en una sola transacción.
+        Con replace=True (episodios scrapeados) un episodio nuevo recibe el siguiente id libre
+        entre la base de datos, __screencaps.json y su contador de ids reservados, el episodio
+        pasa a changed y su enlace de gallery[] queda pendiente de exportar.
+        Con replace=False (importación de __screencaps.json) se conserva el id del registro
+        (ValueError si no coincide con el de la base de datos) y un episodio que ya existe
+        solo se actualiza si el registro es más reciente (scraped_at). Devuelve cuántos se
+        escribieron"""
+        if not replace or self.screencaps_path is None:
+            return self._upsert(records, replace)
+        with file_lock(self.screencaps_path):
+            # Lo que otro proceso haya añadido al fichero entra antes de dar ids nuevos
+            if file_version(self.screencaps_path) != self._json_version:
+                self.import_json(self.screencaps_path)
+            return self._upsert(records, replace, reserved_next_id(self.screencaps_path))
+
+    def _upsert(self, records, replace, next_id=None):
+        written = 0
+        with self._transaction() as db:
+            if next_id is not None:
+                next_id = max(next_id, db.execute(
+                    'SELECT COALESCE(MAX(id) + 1, 0) FROM episodes'
+                ).fetchone()[0])
+                first_id = next_id
+            for record in records:
+                key = (record['series_slug'], record['episode_number'])
+                record_id = None
+                if replace and next_id is not None and db.execute(
+                    'SELECT 1 FROM episodes WHERE series_slug = ? AND episode_number = ?', key
+                ).fetchone() is None:
+                    record_id = next_id
+                    next_id += 1
+                if not replace:
+                    record_id = self._import_id(db, key, record.get('id'))
+                    row = db.execute(
+                        'SELECT scraped_at FROM episodes WHERE series_slug = ? AND episode_number = ?', key
+                    ).fetchone()
+                    if row and (record.get('scraped_at') or '') <= (row['scraped_at'] or ''):
+                        continue
+                db.execute(UPSERT_EPISODE, (record_id,) + key + (
+                    record.get('episode_title'), record.get('source'), record.get('scraped_at')
+                ))
+                db.execute('DELETE FROM screencaps WHERE series_slug = ? AND episode_number = ?', key)
+                db.executemany(
+                    'INSERT INTO screencaps (series_slug, episode_number, position, url) VALUES (?, ?, ?, ?)',
+                    [key + (position, url) for position, url in enumerate(record.get('screencaps', []))]
+                )
+                written += 1
+                if replace:
+                    db.execute(
+                        'INSERT OR IGNORE INTO gallery_links (series_slug, episode_number, screencap_id) '
+                        'SELECT series_slug, episode_number, id FROM episodes '
+                        'WHERE series_slug = ? AND episode_number = ?', key
+                    )
+                    self.changed.add(key)
+            # Antes del COMMIT: si el proceso muere después, los ids ya están reservados
+            if next_id is not None and next_id > first_id:
+                reserve_next_id(self.screencaps_path, next_id)
+        return written
+
+    @staticmethod
+    def _import_id(db, key, record_id):
+        """Id del JSON para un registro importado. Si la base de datos ya usa ese id para
+        otro episodio, o tiene otro id para este, los ids de gallery[] dejarían de
+        corresponderse: ValueError en lugar de renumerar"""
+        if record_id is None:
+            return None
+        row = db.execute(
+            'SELECT id FROM episodes WHERE series_slug = ? AND episode_number = ?', key
+        ).fetchone()
+        if row and row['id'] != record_id:
+            raise ValueError(
+                f"{key[0]} {key[1]} tiene el id {row['id']} en la base de datos y {record_id} en el JSON"
+            )
+        row = db.execute(
+            'SELECT series_slug, episode_number FROM episodes WHERE id = ?', (record_id,)
+        ).fetchone()
+        if row and (row['series_slug'], row['episode_number']) != key:
+            raise ValueError(
+                f"El id {record_id} de {key[0]} {key[1]} en el JSON ya es de "
+                f"{row['series_slug']} {row['episode_number']} en la base de datos"
+            )
+        return record_id
+
+    def existing_keys(self):
+        """(series_slug, episode_number) de todos los episodios con screencaps"""
+        return [
+            (row['series_slug'], row['episode_number'])
+            for row in self._db().execute('SELECT DISTINCT series_slug, episode_number FROM screencaps')
+        ]
+
+    def pending_links(self):
+        """{(series_slug, episode_number): id} de los enlaces de gallery[] sin exportar"""
+        return {
+            (row['series_slug'], row['episode_number']): row['screencap_id']
+            for row in self._db().execute(
+                'SELECT series_slug, episode_number, screencap_id FROM gallery_links WHERE exported = 0'
+            )
+        }
+
+    def export_gallery(self, link_gallery):
+        """Exporta a __episodes.json los enlaces de gallery[] pendientes con
+        link_gallery({(series_slug, episode_number): id}), que devuelve None si no pudo
+        escribirlos (se quedan pendientes para la próxima exportación). Devuelve lo que
+        devolvió link_gallery (0 si no había enlaces pendientes)"""
+        links = self.pending_links()
+        if not links:
+            return 0
+        result = link_gallery(links)
+        if result is not None:
+            with self._transaction() as db:
+                db.executemany(
+                    'UPDATE gallery_links SET exported = 1 '
+                    'WHERE series_slug = ? AND episode_number = ? AND screencap_id = ?',
+                    [key + (screencap_id,) for key, screencap_id in links.items()]
+                )
+        return result
+
+    def count(self):
+        return self._db().execute('SELECT COUNT(*) FROM episodes').fetchone()[0]
+
+    def iter_records(self):
+        """Registros en el formato de __screencaps.json, ordenados por id, uno a uno (una sola
+        consulta en una transacción de lectura: memoria constante y una vista coherente)"""
+        db = self._db()
+        db.execute('BEGIN')
+        try:
+            rows = db.execute(
+                'SELECT e.id, e.series_slug, e.episode_number, e.episode_title, e.source, '
+                'e.scraped_at, s.url FROM episodes e LEFT JOIN screencaps s '
+                'ON s.series_slug = e.series_slug AND s.episode_number = e.episode_number '
+                'ORDER BY e.id, s.position'
+            )
+            for _, group in groupby(rows, key=lambda row: row['id']):
+                first = next(group)
+                urls = [first['url']] if first['url'] is not None else []
+                urls.extend(row['url'] for row in group)
+                yield {
+                    'series_slug': first['series_slug'],
+                    'episode_number': first['episode_number'],
+                    'episode_title': first['episode_title'],
+                    'screencaps': urls,
+                    'source': first['source'],
+                    'scraped_at': first['scraped_at'],
+                    'id': first['id']
+                }
+        finally:
+            db.execute('COMMIT')
+
+    def import_json(self, screencaps_path):
+        """Añade los episodios de __screencaps.json que faltan en la base de datos (conservando
+        su orden y su id, o su posición si el fichero no tiene ids) y actualiza los que son
+        más recientes en el fichero. Se lee en streaming y se escribe por lotes"""
+        version = file_version(screencaps_path)
+        if version is None:
+            return 0
+        imported = 0
+        batch = []
+        for record in iter_screencaps(screencaps_path):
+            batch.append(record)
+            if len(batch) >= IMPORT_BATCH:
+                imported += self.upsert(batch, replace=False)
+                batch = []
+        if batch:
+            imported += self.upsert(batch, replace=False)
+        # Solo si todo entró: si falla, la próxima exportación vuelve a intentarlo en lugar de
+        # sobrescribir el fichero y perder sus episodios
+        self._json_version = version
+        return imported
+
+    def export_screencaps(self, screencaps_path):
+        """Regenera __screencaps.json (bloqueo + escritura atómica en streaming). Si otro
+        proceso lo modificó desde la última importación o exportación, antes se fusionan sus
+        cambios. Devuelve el número de episodios"""
+        with file_lock(screencaps_path):
+            if file_version(screencaps_path) != self._json_version:
+                self.import_json(screencaps_path)
+            total = write_array_atomic(screencaps_path, 'screencaps', self.iter_records(), lambda count: {
+                'last_updated': datetime.now().isoformat(),
+                'total_episodes': count
+            })
+            self._json_version = file_version(screencaps_path)
+        return total
+
+def open_store(path, screencaps_path, log=print):
+    """Abre la base de datos e importa los episodios de __screencaps.json que le falten"""
+    store = ScreencapsStore(path, screencaps_path)
+    imported = store.import_json(screencaps_path)
+    if imported:
+        log(f"🗄️  {imported} episodios importados de {screencaps_path} a {path}")
+    return store